@@ -5,13 +5,16 @@ from __future__ import annotations
 from ..apis_legacy import (
     create_costing_note,
     create_boq,
+    create_boqs_for_costing_note,  # noqa: F401
     opportunity_defaults,
     push_boq_to_costing_on_submit,
     update_opportunity_rate_on_cn_submit,
     get_boq_totals,
+    get_boq_totals_readonly,  # noqa: F401
+    get_boq_totals_many,  # noqa: F401
     make_quotation_with_standard,
 )
 
 # expose the new naming function under c4pricing.api.next_code
-from .item_code_rules import next_code  # noqa: F401
+from .item_code_rules import next_code, reserve_item_codes  # noqa: F401
 from .item_group_filters import bounds   # noqa: F401
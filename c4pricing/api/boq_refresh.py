@@ -0,0 +1,234 @@
+# c4pricing/api/boq_refresh.py
+from __future__ import annotations
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt
+
+from c4pricing.c4pricing.doctype.boq.boq import apply_rates, cost_rows
+
+from .cost_sources import SOURCES, resolve_rates
+
+LOG_DOCTYPE = "BOQ Cost Refresh"
+REALTIME_EVENT = "c4pricing_boq_cost_refresh"
+DEFAULT_CHUNK_SIZE = 50
+
+
+# --------------------- Enqueue ---------------------
+
+@frappe.whitelist()
+def enqueue_bulk_cost_refresh(
+    costing_note: str | None = None,
+    project: str | None = None,
+    cost_type: str | None = None,
+    all_drafts=0,
+    source: str = "price_list",
+    price_list: str = "Standard Buying",
+    warehouse: str | None = None,
+    company: str | None = None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+):
+    """
+    Reprice every matching draft BOQ in background jobs of `chunk_size` BOQs.
+
+    Filter by costing note / project / cost type, or pass all_drafts=1
+    (System Manager only). Only BOQs the user may write are repriced.
+    Returns the BOQ Cost Refresh record that collects the summary.
+    """
+    frappe.has_permission("BOQ", "write", throw=True)
+    if cint(all_drafts):
+        frappe.only_for("System Manager")
+
+    if source not in SOURCES:
+        source = "price_list"
+
+    filters = {"docstatus": 0}
+    if costing_note:
+        filters["costing_note"] = costing_note
+    if project:
+        filters["project"] = project
+    if cost_type:
+        filters["cost_type"] = cost_type
+    if len(filters) == 1 and not cint(all_drafts):
+        frappe.throw(_("Select a Costing Note, Project or Cost Type, or choose all draft BOQs."))
+
+    names = frappe.get_all("BOQ", filters=filters, pluck="name", order_by="name asc")
+    # the jobs save with ignore_permissions: check each BOQ here
+    names = [n for n in names if frappe.has_permission("BOQ", "write", n)]
+    if not names:
+        frappe.throw(_("No draft BOQs you can edit match the selected filters."))
+
+    log = frappe.get_doc(
+        {
+            "doctype": LOG_DOCTYPE,
+            "status": "Queued",
+            "source": source,
+            "price_list": price_list if source == "price_list" else None,
+            "warehouse": warehouse,
+            "company": company,
+            "costing_note": costing_note,
+            "project": project,
+            "cost_type": cost_type,
+            "total_boqs": len(names),
+        }
+    ).insert(ignore_permissions=True)
+
+    size = max(cint(chunk_size) or DEFAULT_CHUNK_SIZE, 1)
+    chunks = [names[i : i + size] for i in range(0, len(names), size)]
+    for chunk in chunks:
+        frappe.enqueue(
+            "c4pricing.api.boq_refresh.reprice_chunk",
+            queue="long",
+            enqueue_after_commit=True,
+            log_name=log.name,
+            boq_names=chunk,
+            source=source,
+            price_list=price_list,
+            warehouse=warehouse,
+            company=company,
+        )
+
+    return {"log": log.name, "boqs": len(names), "jobs": len(chunks)}
+
+
+# --------------------- Background job ---------------------
+
+def reprice_chunk(
+    log_name: str,
+    boq_names,
+    source: str = "price_list",
+    price_list: str = "Standard Buying",
+    warehouse: str | None = None,
+    company: str | None = None,
+):
+    """
+    Reprice one chunk of BOQs with a single rate resolution, then commit.
+
+    A BOQ that fails to load or save is counted as failed and the rest of the
+    chunk goes on; if the chunk itself fails, the log is marked Failed.
+    """
+    frappe.db.sql(
+        f"update `tab{LOG_DOCTYPE}` set status = 'Running' where name = %s and status = 'Queued'",
+        log_name,
+    )
+
+    try:
+        counters = _reprice(boq_names, source, price_list, warehouse, company)
+    except Exception:
+        frappe.db.rollback()
+        _record_progress(log_name, 0, len(boq_names), 0, 0.0, 0.0, [frappe.get_traceback()], chunk_failed=True)
+        frappe.db.commit()
+        raise
+
+    _record_progress(log_name, *counters)
+    frappe.db.commit()
+
+
+# ---- internal helpers -------------------------------------------------
+
+def _reprice(boq_names, source, price_list, warehouse, company):
+    """Reprice the BOQs of a chunk -> (processed, failed, rows_changed, total_before, total_after, errors)."""
+    failed = 0
+    errors = []
+
+    rows_by_doc = []
+    for name in boq_names:
+        try:
+            doc = frappe.get_doc("BOQ", name)
+            rows_by_doc.append((doc, cost_rows(doc)))
+        except Exception:
+            failed += 1
+            errors.append(f"{name}: {frappe.get_traceback()}")
+
+    # one resolution for every distinct item in the chunk
+    rates, _queries = resolve_rates(
+        [r.item for _doc, rows in rows_by_doc for r, _field in rows],
+        source=source,
+        price_list=price_list,
+        warehouse=warehouse,
+        company=company,
+    )
+
+    processed = rows_changed = 0
+    total_before = total_after = 0.0
+
+    for doc, rows in rows_by_doc:
+        frappe.db.savepoint("c4pricing_boq_refresh")
+        before = flt(doc.total_cost)
+        try:
+            changed = apply_rates(rows, rates)
+            doc._recalc_all()
+            doc.save(ignore_permissions=True)
+        except Exception:
+            frappe.db.rollback(save_point="c4pricing_boq_refresh")
+            failed += 1
+            errors.append(f"{doc.name}: {frappe.get_traceback()}")
+            continue
+
+        processed += 1
+        rows_changed += changed
+        total_before += before
+        total_after += flt(doc.total_cost)
+
+    return processed, failed, rows_changed, total_before, total_after, errors
+
+
+def _record_progress(
+    log_name, processed, failed, rows_changed, total_before, total_after, errors, chunk_failed=False
+):
+    """Atomically add this chunk's counters to the summary record and publish progress."""
+    frappe.db.sql(
+        f"""
+        update `tab{LOG_DOCTYPE}`
+        set processed_boqs = processed_boqs + %(processed)s,
+            failed_boqs = failed_boqs + %(failed)s,
+            rows_changed = rows_changed + %(rows_changed)s,
+            total_before = total_before + %(total_before)s,
+            total_after = total_after + %(total_after)s,
+            total_delta = total_delta + %(total_delta)s,
+            error_log = concat(ifnull(error_log, ''), %(errors)s)
+        where name = %(name)s
+        """,
+        {
+            "name": log_name,
+            "processed": processed,
+            "failed": failed,
+            "rows_changed": rows_changed,
+            "total_before": total_before,
+            "total_after": total_after,
+            "total_delta": total_after - total_before,
+            "errors": "".join(f"{e}\n" for e in errors),
+        },
+    )
+
+    log = frappe.db.get_value(
+        LOG_DOCTYPE,
+        log_name,
+        ["owner", "status", "total_boqs", "processed_boqs", "failed_boqs", "rows_changed", "total_delta"],
+        as_dict=True,
+        for_update=True,
+    )
+    done = cint(log.processed_boqs) + cint(log.failed_boqs)
+    status = "Running"
+    if chunk_failed or log.status == "Failed":
+        # a failed chunk fails the whole refresh; later chunks only add their counters
+        status = "Failed"
+    elif done >= cint(log.total_boqs):
+        status = "Completed with Errors" if cint(log.failed_boqs) else "Completed"
+    if status != log.status:
+        frappe.db.set_value(LOG_DOCTYPE, log_name, "status", status, update_modified=False)
+
+    frappe.publish_realtime(
+        REALTIME_EVENT,
+        {
+            "log": log_name,
+            "status": status,
+            "done": done,
+            "total": cint(log.total_boqs),
+            "failed": cint(log.failed_boqs),
+            "rows_changed": cint(log.rows_changed),
+            "total_delta": flt(log.total_delta),
+        },
+        user=log.owner,
+        after_commit=True,
+    )
@@ -0,0 +1,113 @@
+# c4pricing/api/code_meta_cache.py
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+
+import frappe
+
+# ---------------------------------------------------------------------------
+# Cross-request cache for the metadata item codes are built from
+# (Brand / Item Group abbreviations, Item Type abbreviation, main product code).
+#
+#   per-process LRU  ->  Redis hash (frappe.cache)  ->  database
+#
+# Each doctype has a version counter in Redis; a change of the cached field,
+# a rename or a delete drops the Redis entry and bumps the version, which
+# retires every process's LRU entries for that doctype. Plain saves (e.g. a
+# bulk Item import) leave the version alone. The version is re-read at most
+# every _VERSION_TTL seconds, so steady-state code generation makes no
+# metadata queries at all and long background jobs still see bumps.
+# ---------------------------------------------------------------------------
+
+# doctype -> field read for code generation
+FIELD_BY_DOCTYPE = {
+    "Brand": "custom_abr",
+    "Item Group": "custom_abr",
+    "Item Type": "abr",
+    "Item": "item_code",
+}
+
+_LRU_SIZE = 4096
+_VERSION_TTL = 5  # seconds
+_lru: OrderedDict = OrderedDict()
+_stats = {"lru_hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0}
+
+
+def get_meta(doctype: str, name: str | None) -> str:
+    """Cached FIELD_BY_DOCTYPE[doctype] of `name` ('' when empty or missing)."""
+    if not name:
+        return ""
+
+    lru_key = (frappe.local.site, doctype, name, _version(doctype))
+    if lru_key in _lru:
+        _lru.move_to_end(lru_key)
+        _stats["lru_hits"] += 1
+        return _lru[lru_key]
+
+    value = frappe.cache.hget(_hash_key(doctype), name)
+    if value is None:
+        _stats["misses"] += 1
+        value = frappe.db.get_value(doctype, name, FIELD_BY_DOCTYPE[doctype]) or ""
+        frappe.cache.hset(_hash_key(doctype), name, value)
+    else:
+        _stats["redis_hits"] += 1
+
+    _lru[lru_key] = value
+    if len(_lru) > _LRU_SIZE:
+        _lru.popitem(last=False)
+    return value
+
+
+def invalidate(doc, method=None, old=None, new=None, merge=False):
+    """
+    doc_events of Brand, Item Group, Item Type (on_update, on_trash,
+    after_rename) and Item (on_trash, after_rename). on_update only counts
+    when the cached field changed.
+    """
+    if doc.doctype not in FIELD_BY_DOCTYPE:
+        return
+    if method == "on_update" and not doc.has_value_changed(FIELD_BY_DOCTYPE[doc.doctype]):
+        return
+
+    # now, and again once the change is committed: a reader in another
+    # process may have cached the old row between the two
+    doctype, names = doc.doctype, {n for n in (doc.name, old) if n}
+    _drop(doctype, names)
+    frappe.db.after_commit.add(lambda: _drop(doctype, names))
+    _stats["invalidations"] += 1
+
+
+@frappe.whitelist()
+def cache_stats() -> dict:
+    """Hit / miss counters of this worker process."""
+    frappe.only_for("System Manager")
+    return dict(_stats, lru_size=len(_lru))
+
+
+# ---- internal helpers -------------------------------------------------
+
+def _drop(doctype: str, names):
+    for name in names:
+        frappe.cache.hdel(_hash_key(doctype), name)
+    frappe.cache.incr(_version_key(doctype))
+    (frappe.flags.c4pricing_meta_versions or {}).pop(doctype, None)
+
+
+def _hash_key(doctype: str) -> str:
+    return f"c4pricing:code_meta:{doctype}"
+
+
+def _version_key(doctype: str) -> str:
+    return frappe.cache.make_key(f"c4pricing:code_meta_version:{doctype}")
+
+
+def _version(doctype: str) -> int:
+    """Redis version of a doctype, memoized for _VERSION_TTL seconds."""
+    versions = frappe.flags.c4pricing_meta_versions
+    if versions is None:
+        versions = frappe.flags.c4pricing_meta_versions = {}
+    cached, ts = versions.get(doctype), time.monotonic()
+    if cached is None or cached[1] <= ts:
+        cached = versions[doctype] = (int(frappe.cache.get(_version_key(doctype)) or 0), ts + _VERSION_TTL)
+    return cached[0]
@@ -0,0 +1,207 @@
+# c4pricing/api/cost_sources.py
+from __future__ import annotations
+
+import hashlib
+
+import frappe
+from frappe.utils import flt
+
+# Sources understood by BOQ "Update Costs"
+SOURCES = ("price_list", "valuation", "last_purchase")
+
+# Materialized "latest rate per item" table (see rate_snapshot.py)
+SNAPSHOT_DOCTYPE = "Latest Item Rate"
+
+# provenance of a resolved rate (besides the source name itself)
+PROVENANCE_SNAPSHOT = "snapshot"
+VALUATION_BIN = "bin"
+VALUATION_SLE = "stock_ledger"
+
+
+def snapshot_scope(source: str, price_list: str | None = None, warehouse: str | None = None) -> str:
+    """Snapshot scope of a source: price list, warehouse, or '' for 'any'."""
+    if source == "price_list":
+        return price_list or ""
+    if source == "valuation":
+        return warehouse or ""
+    return ""
+
+
+def snapshot_key(source: str, scope: str | None, item_code: str) -> str:
+    """Primary key of a snapshot row (fixed length, safe for long item codes)."""
+    return hashlib.md5(f"{source}\n{scope or ''}\n{item_code}".encode()).hexdigest()
+
+
+# --------------------- Batch resolver ---------------------
+
+def resolve_rates(
+    item_codes,
+    source: str = "price_list",
+    price_list: str = "Standard Buying",
+    warehouse: str | None = None,
+    company: str | None = None,
+    provenance: dict | None = None,
+):
+    """
+    Resolve the latest unit rate for many items at once.
+
+    Issues one set-based query per source instead of one per row. Items
+    present in the Latest Item Rate snapshot are answered by primary key.
+
+    Returns (rates, queries):
+      - rates   : {item_code: rate} for every distinct item (0.0 when none found)
+      - queries : number of lookups issued
+    When a `provenance` dict is passed it is filled with {item_code: label}:
+    "snapshot", "bin", "stock_ledger", the source name, or None when nothing
+    was found.
+    """
+    codes = sorted({c for c in (item_codes or []) if c})
+    stats = {"queries": 0}
+    if not codes:
+        return {}, 0
+
+    origin = {}
+
+    # primary-key lookups in the snapshot first, live queries only for the rest;
+    # the snapshot has no per-company valuation scope
+    found = {}
+    if not (source == "valuation" and company and not warehouse):
+        scope = snapshot_scope(source, price_list, warehouse)
+        found = _snapshot_rates(codes, source, scope, stats)
+        origin.update((c, PROVENANCE_SNAPSHOT) for c in codes if flt(found.get(c)))
+
+    missing = [c for c in codes if not flt(found.get(c))]
+    if missing:
+        if source == "valuation":
+            rates, labels = _valuation_rates(missing, warehouse, company, stats)
+            found.update(rates)
+            origin.update(labels)
+        else:
+            if source == "last_purchase":
+                found.update(_last_purchase_rates(missing, stats))
+            else:
+                found.update(_buying_prices(missing, price_list, stats))
+            origin.update((c, source) for c in missing if flt(found.get(c)))
+
+    if provenance is not None:
+        provenance.update((c, origin.get(c)) for c in codes)
+    return {c: flt(found.get(c)) for c in codes}, stats["queries"]
+
+
+def resolve_valuation_rates(item_codes, warehouse: str | None = None, company: str | None = None) -> dict:
+    """
+    Valuation rate of many items with where it came from, straight from stock data:
+
+        {item_code: {"rate": float, "provenance": "bin" | "stock_ledger" | None}}
+
+    One Bin query for all items plus one window query over Stock Ledger
+    Entry for the items Bin has no rate for.
+    """
+    codes = sorted({c for c in (item_codes or []) if c})
+    if not codes:
+        return {}
+    rates, provenance = _valuation_rates(codes, warehouse, company, {"queries": 0})
+    return {c: {"rate": flt(rates.get(c)), "provenance": provenance.get(c)} for c in codes}
+
+
+# ---- internal helpers -------------------------------------------------
+
+def _snapshot_rates(codes, source: str, scope: str, stats):
+    """Rates already materialized in the snapshot table -> {item_code: rate}."""
+    if not frappe.db.table_exists(SNAPSHOT_DOCTYPE):
+        return {}
+
+    keys = {snapshot_key(source, scope, c): c for c in codes}
+    stats["queries"] += 1
+    rows = frappe.db.sql(
+        f"select name, rate from `tab{SNAPSHOT_DOCTYPE}` where name in %(keys)s",
+        {"keys": tuple(keys)},
+        as_dict=True,
+    )
+    return {keys[r.name]: r.rate for r in rows}
+
+
+def _latest_per_item(doctype: str, field: str, order_by: str, codes, stats, conditions: str = "", values=None):
+    """Newest row per item_code (by order_by) in ONE window query -> {item_code: field}."""
+    values = dict(values or {}, items=tuple(codes))
+    stats["queries"] += 1
+    rows = frappe.db.sql(
+        f"""
+        select item_code, value
+        from (
+            select item_code, `{field}` as value,
+                row_number() over (partition by item_code order by {order_by}) as rn
+            from `tab{doctype}`
+            where item_code in %(items)s {conditions}
+        ) latest
+        where rn = 1
+        """,
+        values,
+        as_dict=True,
+    )
+    return {r.item_code: r.value for r in rows}
+
+
+def _buying_prices(codes, price_list: str, stats):
+    """Latest buying Item Price per item (valid_from desc, modified desc)."""
+    return _latest_per_item(
+        "Item Price",
+        "price_list_rate",
+        "valid_from desc, modified desc",
+        codes,
+        stats,
+        conditions="and price_list = %(price_list)s and buying = 1",
+        values={"price_list": price_list},
+    )
+
+
+def _last_purchase_rates(codes, stats):
+    """Latest submitted Purchase Invoice Item rate; Purchase Receipt Item for items without one."""
+    submitted = "and docstatus = 1"
+    rates = _latest_per_item("Purchase Invoice Item", "rate", "creation desc", codes, stats, submitted)
+
+    missing = [c for c in codes if not flt(rates.get(c))]
+    if missing:
+        receipts = _latest_per_item("Purchase Receipt Item", "rate", "creation desc", missing, stats, submitted)
+        for c in missing:
+            rates[c] = receipts.get(c)
+
+    return rates
+
+
+def _valuation_rates(codes, warehouse: str | None, company: str | None, stats):
+    """
+    Latest Bin valuation_rate, then the latest non-cancelled SLE for items
+    without one -> ({item_code: rate}, {item_code: provenance}).
+
+    Scoped to `warehouse` when given, else to the warehouses of `company`.
+    """
+    if warehouse:
+        bin_scope = sle_scope = "and warehouse = %(warehouse)s"
+    elif company:
+        bin_scope = "and warehouse in (select name from `tabWarehouse` where company = %(company)s)"
+        sle_scope = "and company = %(company)s"
+    else:
+        bin_scope = sle_scope = ""
+    values = {"warehouse": warehouse, "company": company}
+
+    rates = _latest_per_item("Bin", "valuation_rate", "modified desc", codes, stats, bin_scope, values)
+    provenance = {c: VALUATION_BIN for c in codes if flt(rates.get(c))}
+
+    missing = [c for c in codes if c not in provenance]
+    if missing:
+        sles = _latest_per_item(
+            "Stock Ledger Entry",
+            "valuation_rate",
+            "posting_date desc, posting_time desc, creation desc",
+            missing,
+            stats,
+            f"and is_cancelled = 0 {sle_scope}",
+            values,
+        )
+        for c in missing:
+            rates[c] = sles.get(c)
+            if flt(sles.get(c)):
+                provenance[c] = VALUATION_SLE
+
+    return rates, provenance
@@ -0,0 +1,133 @@
+# c4pricing/api/costing_kernel.py
+from __future__ import annotations
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Python path gives identical results
+    np = None
+
+try:
+    from frappe.utils import flt
+except ImportError:  # the kernel has no other Frappe dependency (see tests/test_costing_kernel.py)
+    def flt(s, precision=None):
+        """frappe.utils.flt without rounding: the only form the kernel uses."""
+        if isinstance(s, str):
+            s = s.replace(",", "")
+        try:
+            return float(s)
+        except Exception:
+            return 0.0
+
+# ---------------------------------------------------------------------------
+# Columnar BOQ pricing kernel.
+#
+# Works on any sequence of rows that support .get() (Frappe child Documents,
+# frappe._dict, plain dicts), so BOQ.validate, batch repricing jobs and
+# what-if simulations share the exact same arithmetic:
+#
+#   material / labor   : cost = dc + dc * margin / 100 ; total_cost = cost * qty
+#   expenses / contract: total_cost = cost * qty
+#   table sum          : running left-to-right sum of total_cost
+#
+# Inputs go through flt() exactly like the original per-row loops, and the
+# table sum is accumulated sequentially (np.add.accumulate), so results are
+# bit-for-bit equal with or without NumPy.
+# ---------------------------------------------------------------------------
+
+MARGIN_TABLES = ("material_costs", "labor_costs")
+SIMPLE_TABLES = ("expenses_table", "contractors_table")
+
+
+# --------------------- Array kernels ---------------------
+
+def price_margin_columns(direct_cost, margin, qty, use_numpy: bool = True):
+    """Columns of floats -> (cost list, total_cost list, table sum)."""
+    if not len(direct_cost):
+        return [], [], 0.0
+
+    if np is not None and use_numpy:
+        dc = np.asarray(direct_cost, dtype=np.float64)
+        m = np.asarray(margin, dtype=np.float64)
+        q = np.asarray(qty, dtype=np.float64)
+        cost = dc + (dc * m / 100.0)
+        total = cost * q
+        return cost.tolist(), total.tolist(), float(np.add.accumulate(total)[-1])
+
+    cost, total, table_sum = [], [], 0.0
+    for dc, m, q in zip(direct_cost, margin, qty):
+        c = dc + (dc * m / 100.0)
+        cost.append(c)
+        total.append(c * q)
+        table_sum += c * q
+    return cost, total, table_sum
+
+
+def price_simple_columns(cost, qty, use_numpy: bool = True):
+    """Columns of floats -> (total_cost list, table sum)."""
+    if not len(cost):
+        return [], 0.0
+
+    if np is not None and use_numpy:
+        total = np.asarray(cost, dtype=np.float64) * np.asarray(qty, dtype=np.float64)
+        return total.tolist(), float(np.add.accumulate(total)[-1])
+
+    total, table_sum = [], 0.0
+    for c, q in zip(cost, qty):
+        total.append(c * q)
+        table_sum += c * q
+    return total, table_sum
+
+
+# --------------------- Row adapters ---------------------
+
+def column(rows, field: str):
+    """flt() of one field across rows, as a contiguous list."""
+    return [flt(r.get(field)) for r in rows]
+
+
+def recalc_margin_rows(rows, percent_field: str = "margin", use_numpy: bool = True) -> float:
+    """direct_cost + margin% -> cost -> total_cost, written back to the rows. Returns the table sum."""
+    rows = rows or []
+    cost, total, table_sum = price_margin_columns(
+        column(rows, "direct_cost"), column(rows, percent_field), column(rows, "qty"), use_numpy
+    )
+    for r, c, t in zip(rows, cost, total):
+        _put(r, "cost", c)
+        _put(r, "total_cost", t)
+    return table_sum
+
+
+def recalc_simple_rows(rows, use_numpy: bool = True) -> float:
+    """cost -> total_cost, written back to the rows. Returns the table sum."""
+    rows = rows or []
+    total, table_sum = price_simple_columns(column(rows, "cost"), column(rows, "qty"), use_numpy)
+    for r, t in zip(rows, total):
+        _put(r, "total_cost", t)
+    return table_sum
+
+
+def recalc_tables(tables, use_numpy: bool = True) -> dict:
+    """
+    Price a whole BOQ given as {table fieldname: rows} without a Document.
+    Rows are updated in place; returns the header totals.
+    """
+    totals = {
+        "total_material_costs": recalc_margin_rows(tables.get("material_costs"), use_numpy=use_numpy),
+        "total_labor_costs": recalc_margin_rows(tables.get("labor_costs"), use_numpy=use_numpy),
+        "total_expenses": recalc_simple_rows(tables.get("expenses_table"), use_numpy=use_numpy),
+        "total_contractors": recalc_simple_rows(tables.get("contractors_table"), use_numpy=use_numpy),
+    }
+    totals["total_cost"] = (
+        flt(totals["total_material_costs"])
+        + flt(totals["total_labor_costs"])
+        + flt(totals["total_expenses"])
+        + flt(totals["total_contractors"])
+    )
+    return totals
+
+
+def _put(row, field: str, value):
+    if isinstance(row, dict):
+        row[field] = value
+    else:
+        setattr(row, field, value)
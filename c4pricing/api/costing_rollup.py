@@ -0,0 +1,137 @@
+# c4pricing/api/costing_rollup.py
+from __future__ import annotations
+
+import frappe
+from frappe.utils import flt
+
+from c4pricing.c4pricing.doctype.costing_note.costing_note import row_margin, target_selling_price
+
+from .db_utils import bulk_update
+
+# ---------------------------------------------------------------------------
+# BOQ submit → Costing Note rollup, coalesced per Costing Note.
+#
+# Submitting a BOQ only records "BOQ X changed" in a Redis set for its
+# Costing Note (once the submit has committed) and schedules one short job
+# for that note. Further submits while the job is pending just join the
+# set, so a burst of N submits costs one job and a handful of targeted
+# UPDATEs instead of N full saves. The job locks the Costing Note row, so
+# concurrent bursts can no longer overwrite each other's costing_note_items.
+# ---------------------------------------------------------------------------
+
+_PENDING_KEY = "c4pricing:cn_rollup:pending:{}"
+_SCHEDULED_KEY = "c4pricing:cn_rollup:scheduled:{}"
+_SCHEDULED_TTL = 300
+
+
+def queue_boq_rollup(boq):
+    """Record that `boq` changed and make sure a rollup job is scheduled for its Costing Note."""
+    costing_note = boq.get("costing_note")
+    if not costing_note or not boq.get("line_id"):
+        return
+
+    # only committed submits join the set: a rolled-back one never shows up,
+    # and the job never sees a name whose BOQ it cannot read yet
+    frappe.db.after_commit.add(lambda: _schedule(costing_note, boq.name))
+
+
+def apply_pending_rollup(costing_note: str):
+    """Apply every pending BOQ total to its Costing Note row and roll up the header once."""
+    # from here on, new submits schedule another run instead of being missed
+    frappe.cache.delete(frappe.cache.make_key(_SCHEDULED_KEY.format(costing_note)))
+
+    pending_key = _PENDING_KEY.format(costing_note)
+    # every name in the set belongs to a committed submit (see queue_boq_rollup)
+    boq_names = sorted(frappe.safe_decode(n) for n in (frappe.cache.smembers(pending_key) or []))
+    if not boq_names:
+        return
+
+    # row lock on the Costing Note serializes concurrent rollups
+    cn = frappe.db.sql(
+        "select name, docstatus, profit_margin from `tabCosting Note` where name = %s for update",
+        costing_note,
+        as_dict=True,
+    )
+    if cn and cn[0].docstatus == 0:
+        _apply(cn[0], boq_names)
+        frappe.db.commit()
+
+    frappe.cache.srem(pending_key, *boq_names)
+
+
+# ---- internal helpers -------------------------------------------------
+
+def _schedule(costing_note: str, boq_name: str):
+    frappe.cache.sadd(_PENDING_KEY.format(costing_note), boq_name)
+
+    # atomic "schedule once": only the first submit of a burst enqueues
+    scheduled = frappe.cache.set(
+        frappe.cache.make_key(_SCHEDULED_KEY.format(costing_note)), 1, nx=True, ex=_SCHEDULED_TTL
+    )
+    if scheduled:
+        frappe.enqueue(
+            "c4pricing.api.costing_rollup.apply_pending_rollup",
+            queue="short",
+            costing_note=costing_note,
+        )
+
+
+def _apply(cn, boq_names):
+    # locking read: the latest committed BOQs, whatever snapshot the job started with
+    boqs = frappe.db.sql(
+        """
+        select name, line_id, total_cost
+        from `tabBOQ`
+        where name in %(names)s and docstatus = 1 and costing_note = %(cn)s
+        lock in share mode
+        """,
+        {"names": tuple(boq_names), "cn": cn.name},
+        as_dict=True,
+    )
+    boq_by_line = {b.line_id: b for b in boqs if b.line_id}
+    if not boq_by_line:
+        return
+
+    rows = frappe.get_all(
+        "Costing Note Items",
+        filters={"parent": cn.name, "parenttype": "Costing Note", "parentfield": "costing_note_items"},
+        fields=["name", "qty", "cost", "total_cost", "default_profit_margin", "target_selling_price"],
+        order_by="idx asc",
+    )
+
+    updates = {}
+    for row in rows:
+        boq = boq_by_line.get(row.name)
+        if not boq:
+            continue
+        # same per-row formulas as CostingNote.validate
+        row.cost = flt(boq.total_cost)
+        row.total_cost = row.cost * flt(row.qty)
+        row.target_selling_price = target_selling_price(row.cost, row_margin(row, cn))
+        updates[row.name] = {
+            "cost": row.cost,
+            "total_cost": row.total_cost,
+            "target_selling_price": row.target_selling_price,
+            "total_selling": row.target_selling_price * flt(row.qty),
+            "boq_link": boq.name,
+        }
+
+    if not updates:
+        return
+
+    bulk_update("Costing Note Items", updates)
+
+    # header totals exactly as CostingNote._rollup_totals, from the updated rows
+    total_cost = sum(flt(r.cost) * flt(r.qty) for r in rows)
+    total_selling = sum(flt(r.target_selling_price) * flt(r.qty) for r in rows)
+    total_profit = flt(total_selling) - flt(total_cost)
+    frappe.db.set_value(
+        "Costing Note",
+        cn.name,
+        {
+            "total_cost": total_cost,
+            "total_target_selling_price": total_selling,
+            "total_profit": total_profit,
+            "profit_margin": (total_profit / total_cost) if flt(total_cost) else 0.0,
+        },
+    )
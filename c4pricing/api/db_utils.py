@@ -0,0 +1,37 @@
+# c4pricing/api/db_utils.py
+from __future__ import annotations
+
+import frappe
+from frappe.utils import now
+
+_CHUNK = 500
+
+
+def bulk_update(doctype: str, updates, update_modified: bool = False):
+    """
+    Write {name: {field: value}} with one UPDATE ... CASE statement per chunk
+    of rows instead of one set_value per row.
+    """
+    names = [n for n in (updates or {}) if updates[n]]
+    for i in range(0, len(names), _CHUNK):
+        chunk = names[i : i + _CHUNK]
+        fields = sorted({f for n in chunk for f in updates[n]})
+
+        assignments, values = [], []
+        for field in fields:
+            cases = []
+            for n in chunk:
+                if field in updates[n]:
+                    cases.append("when %s then %s")
+                    values.extend([n, updates[n][field]])
+            assignments.append(f"`{field}` = case name {' '.join(cases)} else `{field}` end")
+
+        if update_modified:
+            assignments.append("modified = %s, modified_by = %s")
+            values.extend([now(), frappe.session.user])
+
+        values.append(tuple(chunk))
+        frappe.db.sql(
+            f"update `tab{doctype}` set {', '.join(assignments)} where name in %s",
+            values,
+        )
@@ -3,7 +3,9 @@ from __future__ import annotations
 import re
 import frappe
 from frappe.model.naming import make_autoname
-from frappe.utils import now_datetime
+from frappe.utils import cint, now_datetime
+
+from .code_meta_cache import get_meta
 
 def _norm(v: str | None) -> str:
     return (v or "").strip().lower()
@@ -12,29 +14,193 @@ def _slug(v: str | None) -> str:
     s = (v or "").upper().strip().replace(" ", "-")
     return re.sub(r"[^A-Z0-9\-]", "", s)
 
+# abbreviations / main codes come from code_meta_cache (LRU -> Redis -> DB)
 def _brand_abr(brand: str | None) -> str:
-    return ((brand and frappe.db.get_value("Brand", brand, "custom_abr")) or "").strip().upper()
+    return get_meta("Brand", brand).strip().upper()
 
 def _group_abr(item_group: str | None) -> str:
-    return ((item_group and frappe.db.get_value("Item Group", item_group, "custom_abr")) or "").strip().upper()
+    return get_meta("Item Group", item_group).strip().upper()
 
 def _type_abr(item_type: str | None) -> str:
-    return ((item_type and frappe.db.get_value("Item Type", item_type, "abr")) or "").strip().upper()
+    return get_meta("Item Type", item_type).strip().upper()
 
 def _main_code(main_item: str | None) -> str:
     if not main_item:
         return ""
-    code = frappe.db.get_value("Item", main_item, "item_code") or main_item
+    code = get_meta("Item", main_item) or main_item
     return _slug(code)
 
+def _highest_suffix(base: str) -> int:
+    """
+    Highest taken suffix for `base` in ONE indexed prefix query on tabItem:
+    -1 when neither base nor base-NNN exists, 0 when only base exists.
+    """
+    start = len(base) + 2
+    has_base, top = frappe.db.sql(
+        """
+        select
+            max(name = %(base)s),
+            max(case when substring(name, %(start)s) regexp '^[0-9]+$'
+                     then cast(substring(name, %(start)s) as unsigned) end)
+        from `tabItem`
+        where name = %(base)s or name like %(prefix)s
+        """,
+        {"base": base, "prefix": f"{base}-%", "start": start},
+    )[0]
+    if top:
+        return int(top)
+    return 0 if has_base else -1
+
 def _unique_code(base: str, width: int = 3) -> str:
-    if not frappe.db.exists("Item", base):
-        return base
-    for i in range(1, 1000):
-        candidate = f"{base}-{i:0{width}d}"
-        if not frappe.db.exists("Item", candidate):
-            return candidate
-    frappe.throw("Unable to generate unique code. Please revise naming rule.")
+    """
+    Allocate base, base-001, base-002, ... atomically.
+
+    A per-base counter row in tabSeries (key "{base}-", the same key
+    make_autoname would use) holds the last allocated suffix; 0 stands for
+    base itself. INSERT ... ON DUPLICATE KEY UPDATE seeds it from existing
+    Items and increments it under a row lock held until commit, so
+    parallel imports always get distinct codes in O(1) queries.
+    """
+    return _reserve_block(("unique", base, width), 1)[0]
+
+def _reserve_block(plan, count: int) -> list[str]:
+    """Reserve `count` consecutive codes of a plan with a single counter update."""
+    kind, prefix, digits = plan
+    if kind == "unique":
+        key = f"{prefix}-"
+        seed = _highest_suffix(prefix) + 1
+        frappe.db.sql(
+            """
+            insert into `tabSeries` (name, current) values (%s, %s)
+            on duplicate key update current = greatest(current + %s, values(current))
+            """,
+            (key, seed + count - 1, count),
+        )
+    else:
+        key = prefix
+        frappe.db.sql(
+            """
+            insert into `tabSeries` (name, current) values (%s, %s)
+            on duplicate key update current = current + values(current)
+            """,
+            (key, count),
+        )
+
+    last = cint(frappe.db.sql("select current from `tabSeries` where name = %s", key)[0][0])
+    # a unique base runs out of suffixes; a series just grows wider, like make_autoname
+    if kind == "unique" and last >= 10 ** digits:
+        frappe.throw("Unable to generate unique code. Please revise naming rule.")
+
+    codes = []
+    for n in range(last - count + 1, last + 1):
+        if kind == "unique":
+            codes.append(prefix if n == 0 else f"{prefix}-{n:0{digits}d}")
+        else:
+            codes.append(f"{prefix}{n:0{digits}d}")
+    return codes
+
+def _series_current(key: str) -> int | None:
+    """Current value of a tabSeries counter without touching it (None if absent)."""
+    row = frappe.db.sql("select current from `tabSeries` where name = %s", key)
+    return cint(row[0][0]) if row else None
+
+class _Incomplete(Exception):
+    """Raised by _code_plan(strict=False) when the inputs do not define a code yet."""
+
+
+def _code_plan(
+    item_type: str,
+    item_group: str | None = None,
+    brand: str | None = None,
+    main_product: str | None = None,
+    part_type: str | None = None,
+    item_name: str | None = None,
+    strict: bool = True,
+):
+    """
+    Resolve the naming rule for the inputs without consuming anything:
+      ("series", prefix, digits) -> make_autoname(f"{prefix}.{'#' * digits}")
+      ("unique", base, width)    -> _unique_code(base, width)
+    With strict=False, incomplete inputs return None instead of throwing.
+    """
+    def need(value, message):
+        if not value:
+            if strict:
+                frappe.throw(message)
+            raise _Incomplete
+        return value
+
+    t = _norm(item_type)
+    try:
+        # Standard Product → Brand + Group
+        if t == "standard product":
+            b = _brand_abr(brand)
+            g = _group_abr(item_group)
+            need(b, "Please set <b>custom_abr</b> on the selected <b>Brand</b>.")
+            need(g, "Please set <b>custom_abr</b> on the selected <b>Item Group</b>.")
+            return ("series", f"{b}-{g}-", 3)
+
+        # Asset Item → ASS-YY-{Group}-###
+        if t in ("asset item", "asset"):
+            yy = now_datetime().strftime("%y")
+            g = need(_group_abr(item_group), "Please set <b>custom_abr</b> on the selected <b>Item Group</b>.")
+            return ("series", f"ASS-{yy}-{g}-", 3)
+
+        # Accessories → ACS-####
+        if t == "accessories":
+            return ("series", "ACS-", 4)
+
+        # Part → PRT-(main_product)-(part_type) with uniqueness
+        if t == "part":
+            mp = _main_code(main_product)
+            pt = _slug(part_type)
+            need(mp, "Please select <b>Main Product</b> (field: custom_main_product).")
+            need(pt, "Please set <b>Part Type</b> (field: custom_part_type).")
+            return ("unique", f"PRT-{mp}-{pt}", 3)
+
+        # WIP → WIP-(main_product)-item_name with uniqueness
+        if t == "wip":
+            mp = _main_code(main_product)
+            nm = _slug(item_name)
+            need(mp, "Please select <b>Main Product</b> (field: custom_main_product).")
+            need(nm, "Please set <b>Item Name</b>.")
+            return ("unique", f"WIP-{mp}-{nm}", 3)
+
+        # Material Item → MTR-{Group}-###
+        if t == "material item":
+            g = need(_group_abr(item_group), "Please set <b>custom_abr</b> on the selected <b>Item Group</b>.")
+            return ("series", f"MTR-{g}-", 3)
+
+        # Customized Product → {Type.abr}-{Group}-###
+        if t == "customized product":
+            ta = _type_abr(item_type)
+            g  = _group_abr(item_group)
+            need(ta, "Please set <b>abr</b> on the selected <b>Item Type</b>.")
+            need(g, "Please set <b>custom_abr</b> on the selected <b>Item Group</b>.")
+            return ("series", f"{ta}-{g}-", 3)
+
+        need(None, f"No naming rule defined for Item Type: <b>{item_type}</b>")
+    except _Incomplete:
+        return None
+
+# set by the Item form to the previewed item_code (item_autocode.js)
+PREVIEW_KEY = "__c4pricing_code_preview"
+
+def _consume(plan) -> str:
+    kind, prefix, digits = plan
+    if kind == "unique":
+        return _unique_code(prefix, width=digits)
+    return make_autoname(f"{prefix}.{'#' * digits}")
+
+def _peek(plan) -> str:
+    """The code _consume(plan) would return right now, without incrementing any counter."""
+    kind, prefix, digits = plan
+    if kind == "unique":
+        current = _series_current(f"{prefix}-")
+        n = max(_highest_suffix(prefix) + 1, -1 if current is None else current + 1)
+        return prefix if n == 0 else f"{prefix}-{n:0{digits}d}"
+    n = (_series_current(prefix) or 0) + 1
+    return f"{prefix}{n:0{digits}d}"
 
 @frappe.whitelist()
 def next_code(
@@ -44,6 +210,7 @@ def next_code(
     main_product: str | None = None,
     part_type: str | None = None,
     item_name: str | None = None,
+    preview=0,
 ) -> str:
     """
     Naming rules:
@@ -54,68 +221,41 @@ def next_code(
       - Customized Product   : {ItemType.abr}-{ItemGroup.custom_abr}-###
       - Part                 : PRT-(custom_main_product)-(custom_part_type)  [unique if needed]
       - WIP                  : WIP-(custom_main_product)-item_name           [unique if needed]
+
+    preview=1 returns the would-be next code without consuming the naming
+    series (no write, no lock on tabSeries). The form sends the preview back
+    as doc[PREVIEW_KEY]; before_insert_set_code then takes a real number.
     """
-    t = _norm(item_type)
+    plan = _code_plan(item_type, item_group, brand, main_product, part_type, item_name)
+    return _peek(plan) if cint(preview) else _consume(plan)
+
+@frappe.whitelist()
+def reserve_item_codes(specs) -> list[str]:
+    """
+    Bulk code generation for catalogue imports.
+
+    `specs` is a list of {item_type, item_group, brand, main_product,
+    part_type, item_name}. Specs are grouped by naming pattern and each
+    pattern reserves a contiguous block of numbers with ONE counter update.
+    Returns the codes in input order. Put them in the import file's
+    item_code column: before_insert_set_code keeps any item_code that is not
+    a form preview, so no abbreviation lookups or series increments run.
+    """
+    specs = frappe.parse_json(specs) if isinstance(specs, str) else (specs or [])
+    frappe.has_permission("Item", "create", throw=True)
+
+    fields = ("item_type", "item_group", "brand", "main_product", "part_type", "item_name")
+    plan_by_spec = {}
+    positions = {}
+    for i, spec in enumerate(specs):
+        args = tuple((spec or {}).get(f) or None for f in fields)
+        if args not in plan_by_spec:
+            plan_by_spec[args] = _code_plan(*args)
+        positions.setdefault(plan_by_spec[args], []).append(i)
+
+    codes = [None] * len(specs)
+    for plan, idxs in positions.items():
+        for i, code in zip(idxs, _reserve_block(plan, len(idxs))):
+            codes[i] = code
 
-    # Standard Product → Brand + Group
-    if t == "standard product":
-        b = _brand_abr(brand)
-        g = _group_abr(item_group)
-        if not b:
-            frappe.throw("Please set <b>custom_abr</b> on the selected <b>Brand</b>.")
-        if not g:
-            frappe.throw("Please set <b>custom_abr</b> on the selected <b>Item Group</b>.")
-        return make_autoname(f"{b}-{g}-.###")
-
-    # Asset Item → ASS-YY-{Group}-###
-    if t in ("asset item", "asset"):
-        yy = now_datetime().strftime("%y")
-        g = _group_abr(item_group)
-        if not g:
-            frappe.throw("Please set <b>custom_abr</b> on the selected <b>Item Group</b>.")
-        return make_autoname(f"ASS-{yy}-{g}-.###")
-
-    # Accessories → ACS-####
-    if t == "accessories":
-        return make_autoname("ACS-.####")
-
-    # Part → PRT-(main_product)-(part_type) with uniqueness
-    if t == "part":
-        mp = _main_code(main_product)
-        pt = _slug(part_type)
-        if not mp:
-            frappe.throw("Please select <b>Main Product</b> (field: custom_main_product).")
-        if not pt:
-            frappe.throw("Please set <b>Part Type</b> (field: custom_part_type).")
-        base = f"PRT-{mp}-{pt}"
-        return _unique_code(base, width=3)
-
-    # WIP → WIP-(main_product)-item_name with uniqueness
-    if t == "wip":
-        mp = _main_code(main_product)
-        nm = _slug(item_name)
-        if not mp:
-            frappe.throw("Please select <b>Main Product</b> (field: custom_main_product).")
-        if not nm:
-            frappe.throw("Please set <b>Item Name</b>.")
-        base = f"WIP-{mp}-{nm}"
-        return _unique_code(base, width=3)
-
-    # Material Item → MTR-{Group}-###
-    if t == "material item":
-        g = _group_abr(item_group)
-        if not g:
-            frappe.throw("Please set <b>custom_abr</b> on the selected <b>Item Group</b>.")
-        return make_autoname(f"MTR-{g}-.###")
-
-    # Customized Product → {Type.abr}-{Group}-###
-    if t == "customized product":
-        ta = _type_abr(item_type)
-        g  = _group_abr(item_group)
-        if not ta:
-            frappe.throw("Please set <b>abr</b> on the selected <b>Item Type</b>.")
-        if not g:
-            frappe.throw("Please set <b>custom_abr</b> on the selected <b>Item Group</b>.")
-        return make_autoname(f"{ta}-{g}-.###")
-
-    frappe.throw(f"No naming rule defined for Item Type: <b>{item_type}</b>")
+    return codes
@@ -1,6 +1,10 @@
 # c4pricing/api/item_group_filters.py
 from __future__ import annotations
 import frappe
+from frappe.utils import cint
+
+# Cached Item Group tree, rebuilt from lft/rgt after any Item Group change
+_TREE_KEY = "c4pricing:item_group_tree"
 
 @frappe.whitelist()
 def bounds(parent_group: str):
@@ -8,7 +12,68 @@ def bounds(parent_group: str):
     Return lft/rgt for a parent Item Group so the client can filter
     all descendants (children + sub-children).
     """
-    rec = frappe.db.get_value("Item Group", parent_group, ["lft", "rgt"], as_dict=True)
+    rec = _tree().get(parent_group)
     if not rec:
         frappe.throw(f"Item Group '{parent_group}' not found.")
-    return {"lft": rec.lft, "rgt": rec.rgt}
+    return {"lft": rec["lft"], "rgt": rec["rgt"]}
+
+def descendants(ancestor: str, leaves_only: bool = True, include_self: bool = False) -> list[str]:
+    """All Item Groups under `ancestor` (nested-set order), answered from the cached tree."""
+    tree = _tree()
+    root = tree.get(ancestor)
+    if not root:
+        return []
+    return [
+        name
+        for name, g in tree.items()
+        if root["lft"] <= g["lft"] and g["rgt"] <= root["rgt"]
+        and (include_self or name != ancestor)
+        and not (leaves_only and g["is_group"])
+    ]
+
+def is_under(group: str, ancestor: str) -> bool:
+    """True when `group` is `ancestor` or one of its descendants."""
+    tree = _tree()
+    g, root = tree.get(group), tree.get(ancestor)
+    return bool(g and root and root["lft"] <= g["lft"] and g["rgt"] <= root["rgt"])
+
+@frappe.whitelist()
+@frappe.validate_and_sanitize_search_inputs
+def item_group_query(doctype, txt, searchfield, start, page_len, filters):
+    """
+    Link query for Item.item_group. filters:
+      - ancestor    : only groups under this Item Group
+      - leaves_only : 1 to drop group nodes (default 0)
+      - name        : a single allowed group
+    """
+    filters = frappe.parse_json(filters) if isinstance(filters, str) else (filters or {})
+    txt = (txt or "").lower()
+
+    if filters.get("name"):
+        names = [filters["name"]] if filters["name"] in _tree() else []
+    elif filters.get("ancestor"):
+        names = descendants(filters["ancestor"], leaves_only=bool(cint(filters.get("leaves_only"))))
+    else:
+        names = list(_tree())
+
+    names = [n for n in names if txt in n.lower()]
+    start, page_len = cint(start), cint(page_len) or 20
+    return [(n,) for n in names[start:start + page_len]]
+
+def clear_tree_cache(doc=None, method=None, *args):
+    """doc_events on Item Group (on_update / on_trash / after_rename)."""
+    # again after commit, or a concurrent rebuild may cache the old tree
+    frappe.cache.delete_value(_TREE_KEY)
+    frappe.db.after_commit.add(lambda: frappe.cache.delete_value(_TREE_KEY))
+
+def _tree() -> dict:
+    """{name: {lft, rgt, is_group}} ordered by lft; one query per cache rebuild."""
+    return frappe.cache.get_value(_TREE_KEY, _build_tree)
+
+def _build_tree() -> dict:
+    rows = frappe.get_all(
+        "Item Group",
+        fields=["name", "lft", "rgt", "is_group"],
+        order_by="lft asc",
+    )
+    return {r.name: {"lft": cint(r.lft), "rgt": cint(r.rgt), "is_group": cint(r.is_group)} for r in rows}
@@ -0,0 +1,357 @@
+# c4pricing/api/item_search.py
+from __future__ import annotations
+
+import re
+
+import frappe
+from frappe.utils import cint, flt, now
+
+# FULLTEXT index added by c4pricing.patches.add_item_search_index
+FULLTEXT_INDEX = "c4pricing_item_search"
+FULLTEXT_COLUMNS = ("item_code", "item_name", "description")
+
+# composite index added by c4pricing.patches.add_item_dimension_index; the
+# selector always filters by item type, other filters are checked on the range
+DIMENSION_INDEX = "c4pricing_item_dimensions"
+DIMENSION_COLUMNS = ("custom_item_type", "custom_width", "custom_hight", "custom_depth")
+
+# half-widths of the nearest-size search box, in the dimension fields' own
+# units; None drops the box
+_NEAREST_WINDOWS = (10.0, 50.0, 250.0, 1250.0, None)
+
+# InnoDB ignores shorter tokens (innodb_ft_min_token_size)
+_MIN_TOKEN = 3
+
+# Item fields the Opportunity selector shows
+SELECTOR_FIELDS = (
+    "name",
+    "item_name",
+    "description",
+    "stock_uom",
+    "image",
+    "item_group",
+    "custom_material_line",
+    "custom_width",
+    "custom_hight",
+    "custom_depth",
+)
+
+
+# --------------------- Text search ---------------------
+
+@frappe.whitelist()
+def search_items(
+    txt: str | None = None,
+    item_type: str | None = None,
+    brand: str | None = None,
+    item_group: str | None = None,
+    material_line: str | None = None,
+    width=None,
+    height=None,
+    depth=None,
+    tolerance=None,
+    nearest=0,
+    after=None,
+    limit=20,
+):
+    """
+    Ranked item search for the Opportunity selector.
+
+    An item matches when the whole text is a prefix of its code or name, or
+    when its item_code / item_name / description hold every word of 3+
+    characters as a prefix (FULLTEXT index); shorter words then narrow those
+    hits to items whose code or name has a word starting with them. Exact and
+    prefix code hits rank first.
+
+    Dimensions (any of width / height / depth):
+      - tolerance : match each given size within +/- tolerance (0 = exact)
+      - nearest   : 1 to ignore tolerance and return the closest sizes
+    With dimensions, results are ranked by size distance instead of text score;
+    items without a value for a requested dimension never match.
+
+    Keyset pagination: pass the returned `next` cursor back as `after`.
+    Returns {"items": [...], "next": cursor or None}.
+    """
+    frappe.has_permission("Item", "read", throw=True)
+    limit = min(max(cint(limit) or 20, 1), 200)
+
+    conditions, values = _filter_conditions(item_type, brand, item_group, material_line)
+    score = "0"
+    hits = None
+
+    txt = (txt or "").strip()
+    if txt:
+        hits = _text_hits(txt, values)
+        score = "hits.score"
+
+    dims = _dimensions(width, height, depth, values)
+    if not dims:
+        return _page(conditions, values, score, after, limit, hits=hits)
+
+    conditions += [f"`{f}` is not null" for f in dims]
+    score = f"-round({_distance(dims)}, 6)"
+    if cint(nearest):
+        return _nearest(conditions, values, dims, score, after, limit, flt(tolerance), hits)
+
+    values["tolerance"] = abs(flt(tolerance))
+    return _page(conditions + _box(dims, "tolerance"), values, score, after, limit, hits=hits)
+
+
+# --------------------- Catalogue delta ---------------------
+
+# Item fields the browser keeps for local filtering (no descriptions: too large)
+CATALOGUE_FIELDS = (
+    "name",
+    "item_name",
+    "custom_item_type",
+    "brand",
+    "item_group",
+    "custom_material_line",
+    "custom_width",
+    "custom_hight",
+    "custom_depth",
+    "stock_uom",
+    "image",
+    "disabled",
+    "modified",
+)
+
+
+@frappe.whitelist()
+def catalogue_delta(since=None, after=None, deleted_since=None, with_deleted=0, limit=2000):
+    """
+    Items changed after a watermark, for the selector's local catalogue copy.
+
+    Keyset on (modified, name): pass the returned `watermark` back as
+    `since` / `after` until `more` is false. Disabled items are included
+    (flagged) so the client can drop them. With with_deleted=1 (once per
+    sync), Item deletions newer than `deleted_since` come along with their
+    own watermark, `deleted_since`, independent of the item keyset.
+    """
+    frappe.has_permission("Item", "read", throw=True)
+    limit = min(max(cint(limit) or 2000, 1), 5000)
+
+    values = {"limit": limit + 1}
+    keyset = ""
+    if since:
+        values.update(since=since, after=after or "")
+        keyset = "where modified > %(since)s or (modified = %(since)s and name > %(after)s)"
+
+    rows = frappe.db.sql(
+        f"""
+        select {", ".join(f"`{f}`" for f in CATALOGUE_FIELDS)}
+        from `tabItem`
+        {keyset}
+        order by modified asc, name asc
+        limit %(limit)s
+        """,
+        values,
+        as_dict=True,
+    )
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    watermark = {"since": since, "after": after}
+    if rows:
+        watermark = {"since": str(rows[-1].modified), "after": rows[-1].name}
+    for r in rows:
+        r.modified = str(r.modified)
+
+    out = {"items": rows, "more": more, "watermark": watermark}
+    if cint(with_deleted):
+        out["deleted"], out["deleted_since"] = _deleted_items(deleted_since)
+    return out
+
+
+# ---- internal helpers -------------------------------------------------
+
+def _deleted_items(deleted_since):
+    """Names of Items deleted after `deleted_since` and the new deletion watermark."""
+    if not deleted_since:
+        # first sync: nothing cached yet, only the watermark matters
+        latest = frappe.db.get_value("Deleted Document", {"deleted_doctype": "Item"}, "max(creation)")
+        return [], str(latest or now())
+
+    rows = frappe.get_all(
+        "Deleted Document",
+        filters={"deleted_doctype": "Item", "creation": [">", deleted_since]},
+        fields=["deleted_name", "creation"],
+        order_by="creation asc",
+    )
+    if not rows:
+        return [], deleted_since
+    return [r.deleted_name for r in rows], str(rows[-1].creation)
+
+
+
+def _filter_conditions(item_type=None, brand=None, item_group=None, material_line=None):
+    """Structured selector filters as SQL conditions on tabItem."""
+    conditions = ["disabled = 0"]
+    values = {}
+    for field, value in (
+        ("custom_item_type", item_type),
+        ("brand", brand),
+        ("item_group", item_group),
+        ("custom_material_line", material_line),
+    ):
+        if value:
+            conditions.append(f"`{field}` = %({field})s")
+            values[field] = value
+    return conditions, values
+
+
+def _text_hits(txt: str, values: dict) -> list[tuple[str, str]]:
+    """
+    (condition, score) branches of a free-text query; an item matching any
+    branch is a hit and keeps its best score.
+
+    Each condition can be served by one index (PRIMARY, item_name, FULLTEXT),
+    so the branches are UNIONed rather than ORed: MariaDB cannot use a
+    FULLTEXT index for a MATCH inside an OR.
+    """
+    values["txt"] = txt
+    values["txt_prefix"] = f"{_escape_like(txt)}%"
+    score = "(name = %(txt)s) * 100 + (name like %(txt_prefix)s) * 50 + (item_name like %(txt_prefix)s) * 20"
+    branches = [
+        ("name like %(txt_prefix)s", score),
+        ("item_name like %(txt_prefix)s", score),
+    ]
+
+    tokens = re.findall(r"\w+", txt)
+    long_tokens = [t for t in tokens if len(t) >= _MIN_TOKEN]
+    if not long_tokens or not _has_fulltext():
+        # short words alone (or no FULLTEXT index): code / name prefixes only
+        return branches
+
+    values["ft"] = " ".join(f"+{t}*" for t in long_tokens)
+    match = f"match({', '.join(FULLTEXT_COLUMNS)}) against (%(ft)s in boolean mode)"
+    condition = [match]
+    for i, t in enumerate(t for t in tokens if len(t) < _MIN_TOKEN):
+        # evaluated on the FULLTEXT hits only, so the inner-word LIKE is no scan
+        values[f"tok{i}"] = f"{_escape_like(t)}%"
+        values[f"word{i}"] = f"% {_escape_like(t)}%"
+        condition.append(f"(name like %(tok{i})s or item_name like %(tok{i})s or item_name like %(word{i})s)")
+    branches.append((" and ".join(condition), f"round({score} + {match}, 6)"))
+    return branches
+
+
+def _dimensions(width, height, depth, values: dict) -> list[str]:
+    """Dimension fields given in the query; their values go into `values`."""
+    dims = []
+    for field, value in (("custom_width", width), ("custom_hight", height), ("custom_depth", depth)):
+        if value not in (None, ""):
+            values[field] = flt(value)
+            dims.append(field)
+    return dims
+
+
+def _distance(dims) -> str:
+    """Euclidean size distance over the given dimensions (all non-null, see search_items)."""
+    return "sqrt(" + " + ".join(f"pow(`{f}` - %({f})s, 2)" for f in dims) + ")"
+
+
+def _box(dims, window_key: str) -> list[str]:
+    """Range predicates the dimension index can serve."""
+    return [f"`{f}` between %({f})s - %({window_key})s and %({f})s + %({window_key})s" for f in dims]
+
+
+def _nearest(conditions, values, dims, score: str, after, limit: int, start: float, hits=None):
+    """
+    k-nearest sizes: search a box around the requested size and widen it until
+    a full page lies within the box's inscribed distance. Anything outside the
+    box is farther than that distance, so the page is exact.
+    """
+    windows = [w for w in _NEAREST_WINDOWS if w is None or w > start]
+    if start > 0:
+        windows.insert(0, start)
+
+    for window in windows:
+        if window is None:
+            return _page(conditions, values, score, after, limit, hits=hits)
+        values["window"] = window
+        page = _page(
+            conditions + _box(dims, "window"), values, score, after, limit,
+            outer=["score >= -%(window)s"], hits=hits,
+        )
+        if page["next"]:
+            return page
+
+
+def _page(conditions, values, score: str, after, limit: int, outer=None, hits=None):
+    """
+    One keyset page ordered by (score desc, item_name, name).
+
+    With text `hits` (see _text_hits), each branch is filtered by `conditions`
+    on its own and the union is joined back to tabItem, exposing hits.score.
+    """
+    cursor = frappe.parse_json(after) if isinstance(after, str) else after
+    outer = list(outer or [])
+    if cursor:
+        values.update(
+            after_score=flt(cursor.get("score")),
+            after_item_name=cursor.get("item_name") or "",
+            after_name=cursor.get("name") or "",
+        )
+        outer.append("""(
+            score < %(after_score)s
+            or (score = %(after_score)s and sort_name > %(after_item_name)s)
+            or (score = %(after_score)s and sort_name = %(after_item_name)s and name > %(after_name)s)
+        )""")
+    keyset = f"where {' and '.join(outer)}" if outer else ""
+
+    where = " and ".join(conditions)
+    source = f"`tabItem` i where {where}"
+    if hits:
+        union = "\n                    union all\n                    ".join(
+            f"select name, {branch_score} as score from `tabItem` where {where} and {branch}"
+            for branch, branch_score in hits
+        )
+        source = f"""(
+                select name, max(score) as score
+                from (
+                    {union}
+                ) branches
+                group by name
+            ) hits
+            join `tabItem` i on i.name = hits.name"""
+
+    values["limit"] = limit + 1
+    rows = frappe.db.sql(
+        f"""
+        select * from (
+            select {", ".join(f"i.`{f}`" for f in SELECTOR_FIELDS)},
+                ifnull(i.item_name, '') as sort_name,
+                {score} as score
+            from {source}
+        ) ranked
+        {keyset}
+        order by score desc, sort_name asc, name asc
+        limit %(limit)s
+        """,
+        values,
+        as_dict=True,
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = {"score": flt(last.score), "item_name": last.sort_name, "name": last.name}
+
+    for r in rows:
+        r.pop("sort_name", None)
+    return {"items": rows, "next": next_cursor}
+
+
+def _has_fulltext() -> bool:
+    """Whether the FULLTEXT index exists (cached; reset by the patch that adds it)."""
+    def check():
+        if frappe.db.db_type != "mariadb":
+            return 0
+        return 1 if frappe.db.sql("show index from `tabItem` where Key_name = %s", FULLTEXT_INDEX) else 0
+
+    return bool(frappe.cache.get_value("c4pricing:item_fulltext", check))
+
+
+def _escape_like(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
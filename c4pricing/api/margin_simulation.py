@@ -0,0 +1,140 @@
+# c4pricing/api/margin_simulation.py
+from __future__ import annotations
+
+import itertools
+
+import frappe
+from frappe.utils import flt
+
+from c4pricing.c4pricing.doctype.costing_note.costing_note import row_margin, target_selling_price
+
+from .costing_kernel import MARGIN_TABLES, SIMPLE_TABLES, column, price_margin_columns, price_simple_columns
+
+# ---------------------------------------------------------------------------
+# Margin what-if simulation. Nothing is saved.
+#
+#   BOQ          : scenario {"base_margin": x, "s_margin": y}
+#                  x / y replace the margin of every material / labor row
+#                  when they differ from the stored header margin, as saving
+#                  the BOQ with those header margins would (a value equal to
+#                  the stored one keeps the row margins).
+#   Costing Note : scenario {"default_profit_margin": x}
+#                  x replaces the margin of every costing row.
+#
+# A key left out of a scenario keeps the stored row margins. Row inputs are
+# read once into columns; each scenario is then one pass of the costing
+# kernel (BOQ) or of the Costing Note formula over those columns.
+# ---------------------------------------------------------------------------
+
+SCENARIO_KEYS = {
+    "BOQ": ("base_margin", "s_margin"),
+    "Costing Note": ("default_profit_margin",),
+}
+
+_MAX_SCENARIOS = 1000
+
+
+@frappe.whitelist()
+def simulate_margins(doctype: str, name: str, scenarios) -> dict:
+    """
+    Evaluate margin scenarios on a saved BOQ or Costing Note.
+
+    scenarios: a list of scenario dicts, or a grid {key: [values, ...]} that
+    is expanded to every combination.
+    Returns {"baseline": totals with the stored margins, "scenarios": [totals, ...]};
+    totals carry the scenario, total_cost, total_selling, total_profit and
+    profit_margin.
+    """
+    if doctype not in SCENARIO_KEYS:
+        frappe.throw(f"Margin simulation is not available for {doctype}.")
+
+    doc = frappe.get_doc(doctype, name)
+    doc.check_permission("read")
+
+    scenarios = _expand(scenarios, SCENARIO_KEYS[doctype])
+    simulate = _simulate_boq if doctype == "BOQ" else _simulate_costing_note
+    results = simulate(doc, [{}] + scenarios)
+    return {"baseline": results[0], "scenarios": results[1:]}
+
+
+# ---- internal helpers -------------------------------------------------
+
+def _expand(scenarios, keys) -> list[dict]:
+    """Scenario list (a grid dict becomes its cartesian product), restricted to `keys`."""
+    scenarios = frappe.parse_json(scenarios) if isinstance(scenarios, str) else scenarios
+    if isinstance(scenarios, dict):
+        grid = {k: v if isinstance(v, (list, tuple)) else [v] for k, v in scenarios.items() if k in keys}
+        scenarios = [dict(zip(grid, combo)) for combo in itertools.product(*grid.values())]
+
+    out = [{k: flt(s[k]) for k in keys if s.get(k) not in (None, "")} for s in (scenarios or [])]
+    if len(out) > _MAX_SCENARIOS:
+        frappe.throw(f"At most {_MAX_SCENARIOS} scenarios per call.")
+    return out
+
+
+def _totals(scenario: dict, total_cost: float, total_selling: float, profit_base: float) -> dict:
+    total_profit = flt(total_selling) - flt(profit_base)
+    return {
+        "scenario": scenario,
+        "total_cost": total_cost,
+        "total_selling": total_selling,
+        "total_profit": total_profit,
+        "profit_margin": (total_profit / profit_base) if flt(profit_base) else 0.0,
+    }
+
+
+def _simulate_boq(doc, scenarios) -> list[dict]:
+    """
+    BOQ: the priced total (BOQ.total_cost) is what the BOQ sells for, so it is
+    reported as total_selling; total_cost is the cost before margins
+    (direct_cost * qty, plus expenses and contractors).
+    """
+    margin_cols = {}
+    for table in MARGIN_TABLES:
+        rows = doc.get(table) or []
+        margin_cols[table] = (column(rows, "direct_cost"), column(rows, "margin"), column(rows, "qty"))
+
+    # expenses and contractors carry no margin: the same in every scenario
+    simple_totals = [
+        flt(price_simple_columns(column(doc.get(t) or [], "cost"), column(doc.get(t) or [], "qty"))[1])
+        for t in SIMPLE_TABLES
+    ]
+    direct = sum(flt(price_simple_columns(dc, qty)[1]) for dc, _m, qty in margin_cols.values()) + sum(simple_totals)
+
+    header_key = {"material_costs": "base_margin", "labor_costs": "s_margin"}
+    results = []
+    for scenario in scenarios:
+        margin_totals = []
+        for table, (dc, margin, qty) in margin_cols.items():
+            key = header_key[table]
+            # BOQ._sync_row_margins_if_header_changed: only a changed header margin overrides
+            if key in scenario and flt(scenario[key]) != flt(doc.get(key)):
+                margin = [scenario[key]] * len(dc)
+            margin_totals.append(flt(price_margin_columns(dc, margin, qty)[2]))
+        # same summation order as BOQ._recalc_all
+        priced = 0.0
+        for t in margin_totals + simple_totals:
+            priced += flt(t)
+        totals = _totals(scenario, direct, priced, direct)
+        totals["boq_total_cost"] = priced  # BOQ.total_cost after saving this scenario
+        results.append(totals)
+    return results
+
+
+def _simulate_costing_note(doc, scenarios) -> list[dict]:
+    """Costing Note: CostingNote.validate per scenario (target_selling_price, then roll-up)."""
+    rows = doc.get("costing_note_items") or []
+    cost = column(rows, "cost")
+    qty = column(rows, "qty")
+    stored_margin = [row_margin(r, doc) for r in rows]
+    total_cost = sum(c * q for c, q in zip(cost, qty))
+
+    results = []
+    for scenario in scenarios:
+        if "default_profit_margin" in scenario:
+            margin = [scenario["default_profit_margin"]] * len(rows)
+        else:
+            margin = stored_margin
+        total_selling = sum(target_selling_price(c, m) * q for c, m, q in zip(cost, margin, qty))
+        results.append(_totals(scenario, total_cost, total_selling, total_cost))
+    return results
@@ -0,0 +1,288 @@
+# c4pricing/api/rate_snapshot.py
+from __future__ import annotations
+
+import frappe
+from frappe.utils import flt, now
+
+from .cost_sources import (
+    SNAPSHOT_DOCTYPE,
+    SOURCES,
+    _buying_prices,
+    _last_purchase_rates,
+    _valuation_rates,
+    snapshot_key,
+)
+
+# ---------------------------------------------------------------------------
+# "Latest Item Rate" keeps one row per (item, source, scope) with the current
+# rate so BOQ costing can use primary-key lookups instead of sorting the
+# transaction tables. Rows are refreshed incrementally by the doc_events
+# below and rebuilt from scratch with `bench rebuild-rate-snapshot`.
+# ---------------------------------------------------------------------------
+
+_CHUNK = 5000
+
+
+# --------------------- Incremental refresh ---------------------
+
+def refresh(source: str, scope: str | None, item_codes, reference=None):
+    """Recompute the snapshot rows of (source, scope) for the given items from live data."""
+    codes = sorted({c for c in (item_codes or []) if c})
+    if not codes:
+        return
+
+    stats = {"queries": 0}
+    if source == "price_list":
+        rates = _buying_prices(codes, scope, stats)
+    elif source == "last_purchase":
+        rates = _last_purchase_rates(codes, stats)
+    else:
+        rates, _provenance = _valuation_rates(codes, scope or None, None, stats)
+
+    _write(
+        [
+            {
+                "item_code": c,
+                "source": source,
+                "scope": scope or "",
+                "rate": flt(rates.get(c)),
+                "reference_doctype": reference.doctype if reference else None,
+                "reference_name": reference.name if reference else None,
+            }
+            for c in codes
+        ]
+    )
+
+
+# ---- doc_events ---------------------------------------------------------
+
+def on_item_price_change(doc, method=None):
+    """Item Price on_update / after_delete → refresh buying price rows (old and new key)."""
+    keys = set()
+    if doc.get("buying"):
+        keys.add((doc.price_list, doc.item_code))
+
+    before = doc.get_doc_before_save() if method == "on_update" else None
+    if before and before.get("buying"):
+        keys.add((before.price_list, before.item_code))
+
+    for price_list, item_code in keys:
+        refresh("price_list", price_list, [item_code], reference=doc)
+
+
+def on_purchase_change(doc, method=None):
+    """Purchase Invoice / Receipt on_submit / on_cancel → refresh last purchase rows."""
+    items = [r.item_code for r in (doc.get("items") or []) if r.get("item_code")]
+    refresh("last_purchase", "", items, reference=doc)
+
+
+def on_stock_ledger_entry(doc, method=None):
+    """
+    Stock Ledger Entry on_submit → queue (item, warehouse) for a valuation refresh.
+
+    The refresh runs once per transaction, right before commit, and reads
+    the rate ERPNext has reposted by then. A rollback drops the queue with
+    the transaction. Backdated entries are reposted later by Repost Item
+    Valuation, which writes SLE/Bin without doc_events; on_repost_change
+    refreshes those keys.
+    """
+    if not doc.get("item_code"):
+        return
+
+    _queue_valuation([(doc.item_code, doc.warehouse or "")])
+
+
+def on_repost_change(doc, method=None):
+    """
+    Repost Item Valuation on_change → once the repost is Completed, refresh
+    every (item, warehouse) with ledger entries from its posting date on.
+
+    ERPNext marks the repost Completed with db_set, which runs on_change but
+    not on_update.
+    """
+    if doc.get("status") != "Completed":
+        return
+
+    if doc.get("voucher_no"):
+        items = frappe.get_all(
+            "Stock Ledger Entry",
+            filters={"voucher_type": doc.voucher_type, "voucher_no": doc.voucher_no},
+            pluck="item_code",
+            distinct=True,
+        )
+    else:
+        items = [doc.item_code] if doc.get("item_code") else []
+    if not items:
+        return
+
+    keys = frappe.get_all(
+        "Stock Ledger Entry",
+        filters={"item_code": ["in", items], "posting_date": [">=", doc.posting_date]},
+        fields=["item_code", "warehouse"],
+        distinct=True,
+    )
+    _queue_valuation([(k.item_code, k.warehouse or "") for k in keys])
+
+
+def _queue_valuation(keys):
+    pending = frappe.flags.get("c4pricing_valuation_pending")
+    if pending is None:
+        pending = frappe.flags.c4pricing_valuation_pending = set()
+        frappe.db.before_commit.add(_flush_valuation)
+        frappe.db.after_rollback.add(_drop_valuation)
+
+    pending.update(keys)
+
+
+def _drop_valuation():
+    frappe.flags.pop("c4pricing_valuation_pending", None)
+
+
+def _flush_valuation():
+    pending = frappe.flags.pop("c4pricing_valuation_pending", None) or set()
+
+    by_warehouse = {}
+    for item_code, warehouse in pending:
+        by_warehouse.setdefault(warehouse, set()).add(item_code)
+        by_warehouse.setdefault("", set()).add(item_code)
+
+    for warehouse, items in by_warehouse.items():
+        refresh("valuation", warehouse, items)
+
+
+# --------------------- Full rebuild ---------------------
+
+def rebuild(sources=None) -> dict:
+    """Rebuild the snapshot from scratch. Returns {source: rows written}."""
+    sources = [s for s in (sources or SOURCES) if s in SOURCES]
+    written = {}
+
+    for source in sources:
+        frappe.db.sql(f"delete from `tab{SNAPSHOT_DOCTYPE}` where source = %s", source)
+
+        if source == "price_list":
+            rows = [
+                (r.item_code, r.price_list, r.value)
+                for r in _latest_rows(
+                    "Item Price",
+                    "price_list_rate",
+                    "item_code, price_list",
+                    "valid_from desc, modified desc",
+                    "and buying = 1",
+                )
+            ]
+        elif source == "last_purchase":
+            submitted = "and docstatus = 1"
+            rates = {
+                r.item_code: r.value
+                for r in _latest_rows("Purchase Invoice Item", "rate", "item_code", "creation desc", submitted)
+            }
+            for r in _latest_rows("Purchase Receipt Item", "rate", "item_code", "creation desc", submitted):
+                if not flt(rates.get(r.item_code)):
+                    rates[r.item_code] = r.value
+            rows = [(item_code, "", rate) for item_code, rate in rates.items()]
+        else:
+            rows = _rebuild_valuation_rows()
+
+        _write(
+            [
+                {"item_code": item_code, "source": source, "scope": scope or "", "rate": flt(rate)}
+                for item_code, scope, rate in rows
+            ]
+        )
+        written[source] = sum(1 for row in rows if flt(row[2]))
+
+    return written
+
+
+def _rebuild_valuation_rows():
+    """(item, warehouse, rate) and (item, '', rate): latest Bin, latest live SLE where Bin has none."""
+    sle_order = "posting_date desc, posting_time desc, creation desc"
+    sle_live = "and is_cancelled = 0"
+    rows = []
+
+    # per warehouse
+    rates = {
+        (r.item_code, r.warehouse): r.value
+        for r in _latest_rows("Bin", "valuation_rate", "item_code, warehouse", "modified desc")
+    }
+    for r in _latest_rows("Stock Ledger Entry", "valuation_rate", "item_code, warehouse", sle_order, sle_live):
+        if not flt(rates.get((r.item_code, r.warehouse))):
+            rates[(r.item_code, r.warehouse)] = r.value
+    rows.extend((item_code, warehouse, rate) for (item_code, warehouse), rate in rates.items())
+
+    # any warehouse
+    rates = {r.item_code: r.value for r in _latest_rows("Bin", "valuation_rate", "item_code", "modified desc")}
+    for r in _latest_rows("Stock Ledger Entry", "valuation_rate", "item_code", sle_order, sle_live):
+        if not flt(rates.get(r.item_code)):
+            rates[r.item_code] = r.value
+    rows.extend((item_code, "", rate) for item_code, rate in rates.items())
+
+    return rows
+
+
+# ---- internal helpers -------------------------------------------------
+
+def _latest_rows(doctype: str, field: str, partition: str, order_by: str, conditions: str = ""):
+    """Newest row per partition (one window query over the whole table)."""
+    return frappe.db.sql(
+        f"""
+        select {partition}, value
+        from (
+            select {partition}, `{field}` as value,
+                row_number() over (partition by {partition} order by {order_by}) as rn
+            from `tab{doctype}`
+            where ifnull(item_code, '') != '' {conditions}
+        ) latest
+        where rn = 1
+        """,
+        as_dict=True,
+    )
+
+
+def _write(rows):
+    """Upsert rows with a rate, delete the keys of rows without one."""
+    keep = [r for r in rows if flt(r.get("rate"))]
+    drop = [snapshot_key(r["source"], r["scope"], r["item_code"]) for r in rows if not flt(r.get("rate"))]
+
+    for i in range(0, len(drop), _CHUNK):
+        frappe.db.sql(
+            f"delete from `tab{SNAPSHOT_DOCTYPE}` where name in %(keys)s",
+            {"keys": tuple(drop[i : i + _CHUNK])},
+        )
+
+    ts, user = now(), frappe.session.user
+    for i in range(0, len(keep), _CHUNK):
+        chunk = keep[i : i + _CHUNK]
+        values = []
+        for r in chunk:
+            values.extend(
+                [
+                    snapshot_key(r["source"], r["scope"], r["item_code"]),
+                    r["item_code"],
+                    r["source"],
+                    r["scope"],
+                    flt(r["rate"]),
+                    r.get("reference_doctype"),
+                    r.get("reference_name"),
+                    ts,
+                    ts,
+                    user,
+                    user,
+                ]
+            )
+        frappe.db.sql(
+            f"""
+            insert into `tab{SNAPSHOT_DOCTYPE}`
+                (name, item_code, source, scope, rate, reference_doctype, reference_name,
+                 creation, modified, owner, modified_by)
+            values {", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(chunk))}
+            on duplicate key update
+                rate = values(rate),
+                reference_doctype = values(reference_doctype),
+                reference_name = values(reference_name),
+                modified = values(modified),
+                modified_by = values(modified_by)
+            """,
+            values,
+        )
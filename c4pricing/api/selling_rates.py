@@ -0,0 +1,84 @@
+# c4pricing/api/selling_rates.py
+from __future__ import annotations
+
+import frappe
+from frappe.utils import flt
+
+from .cost_sources import _latest_per_item
+
+# one IN (...) list per query; the selector and form send far fewer
+_MAX_ITEMS = 1000
+
+
+@frappe.whitelist()
+def get_selling_rates(item_codes, price_list: str | None = None) -> dict:
+    """
+    Latest selling Item Price rate per item in ONE query -> {item_code: rate}.
+
+    Same rule as the Opportunity form always used: selling prices only,
+    newest modified first, restricted to `price_list` when given.
+    Items without a price come back as 0.
+    """
+    frappe.has_permission("Item Price", "read", throw=True)
+
+    codes = frappe.parse_json(item_codes) if isinstance(item_codes, str) else item_codes
+    codes = list(dict.fromkeys(c for c in (codes or []) if c))
+    if len(codes) > _MAX_ITEMS:
+        frappe.throw(f"At most {_MAX_ITEMS} items per call.")
+    if not codes:
+        return {}
+
+    conditions, values = "and selling = 1", {}
+    if price_list:
+        conditions += " and price_list = %(price_list)s"
+        values["price_list"] = price_list
+
+    stats = {"queries": 0}
+    rates = _latest_per_item("Item Price", "price_list_rate", "modified desc", codes, stats, conditions, values)
+    return {c: flt(rates.get(c)) for c in codes}
+
+
+@frappe.whitelist()
+def get_selector_rows(items, price_list: str | None = None) -> list[dict]:
+    """
+    Priced Opportunity row payloads for the item selector, in request order.
+
+    items: [{"item_code": ..., "qty": ...}, ...]
+    Returns [{item_code, item_name, description, uom, qty, rate, amount}, ...];
+    unknown or disabled items are skipped.
+    """
+    frappe.has_permission("Item", "read", throw=True)
+
+    items = frappe.parse_json(items) if isinstance(items, str) else items
+    wanted = [(i.get("item_code"), flt(i.get("qty")) or 1) for i in (items or []) if i.get("item_code")]
+    if not wanted:
+        return []
+
+    details = {
+        d.name: d
+        for d in frappe.get_all(
+            "Item",
+            filters={"name": ["in", list({c for c, _ in wanted})], "disabled": 0},
+            fields=["name", "item_name", "description", "stock_uom"],
+        )
+    }
+    rates = get_selling_rates([c for c, _ in wanted if c in details], price_list)
+
+    rows = []
+    for code, qty in wanted:
+        it = details.get(code)
+        if not it:
+            continue
+        rate = flt(rates.get(code))
+        rows.append(
+            {
+                "item_code": code,
+                "item_name": it.item_name,
+                "description": it.description,
+                "uom": it.stock_uom,
+                "qty": qty,
+                "rate": rate,
+                "amount": rate * qty,
+            }
+        )
+    return rows
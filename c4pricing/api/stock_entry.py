@@ -43,6 +43,17 @@ def create_stock_entry_from_pick_list(pl_name: str):
     if not rows:
         frappe.throw(_("Pick List has no rows"))
 
+    # prefetch everything the rows need: one Item query + one per defaults DocType
+    stats = {"queries": 0}
+    codes = [getattr(r, "item_code", None) for r in rows]
+    item_meta = _item_meta([c for c in codes if c], stats)
+    needs_default = [
+        item_meta.get(c, {}).get("item_group")
+        for r, c in zip(rows, codes)
+        if c and not (getattr(r, "warehouse", None) or getattr(r, "s_warehouse", None))
+    ]
+    group_defaults = _group_defaults([g for g in needs_default if g], stats)
+
     for r in rows:
         item_code = getattr(r, "item_code", None)
         qty = getattr(r, "qty", None) or getattr(r, "stock_qty", None) or 0
@@ -51,15 +62,18 @@ def create_stock_entry_from_pick_list(pl_name: str):
         if not item_code:
             frappe.throw(_("Pick List row is missing Item Code"))
 
+        meta = item_meta.get(item_code) or {}
+        stock_uom = meta.get("stock_uom") or "Nos"
+
         # لو ما فيش مستودع على السطر، خده من Item Group Defaults (حسب الشركة)
         if not s_wh:
-            s_wh = _get_item_group_default_warehouse(item_code, company)
+            s_wh = _default_warehouse(meta.get("item_group"), company, group_defaults)
 
         se.append("items", {
             "item_code": item_code,
             "qty": qty,
-            "uom": getattr(r, "uom", None) or _get_stock_uom(item_code),
-            "stock_uom": _get_stock_uom(item_code),
+            "uom": getattr(r, "uom", None) or stock_uom,
+            "stock_uom": stock_uom,
             "s_warehouse": s_wh,
             "t_warehouse": wo.wip_warehouse
         })
@@ -67,7 +81,11 @@ def create_stock_entry_from_pick_list(pl_name: str):
     se.flags.ignore_permissions = False
     se.insert()
     frappe.db.commit()
-    return {"stock_entry": se.name, "message": _("Stock Entry {0} created from Pick List {1}").format(se.name, pl.name)}
+    return {
+        "stock_entry": se.name,
+        "message": _("Stock Entry {0} created from Pick List {1}").format(se.name, pl.name),
+        "queries": stats["queries"],
+    }
 
 
 @frappe.whitelist()
@@ -80,8 +98,69 @@ def get_item_group_default_wh(item_code: str, company: str | None = None):
     return _get_item_group_default_warehouse(item_code, company)
 
 
-def _get_stock_uom(item_code: str) -> str:
-    return frappe.db.get_value("Item", item_code, "stock_uom") or "Nos"
+@frappe.whitelist()
+def get_item_group_default_whs(rows, company: str | None = None) -> dict:
+    """
+    Batched get_item_group_default_wh for a whole Pick List.
+
+    rows: [{"name": row name, "item_code": ...}, ...]
+    Returns {row name: default warehouse} for the rows that have one.
+    """
+    rows = frappe.parse_json(rows) if isinstance(rows, str) else (rows or [])
+    if not company:
+        company = frappe.defaults.get_user_default("Company")
+
+    wanted = [(r.get("name"), r.get("item_code")) for r in rows if r.get("name") and r.get("item_code")]
+    if not wanted:
+        return {}
+
+    item_meta = _item_meta([code for _, code in wanted])
+    by_group = _company_group_defaults(
+        [m.item_group for m in item_meta.values() if m.item_group], company
+    )
+
+    out = {}
+    for row_name, code in wanted:
+        meta = item_meta.get(code)
+        wh = by_group.get(meta.item_group) if meta else None
+        if wh:
+            out[row_name] = wh
+    return out
+
+
+def clear_group_default_cache(doc=None, method=None, *args):
+    """doc_events on Item Group (on_update / on_trash / after_rename)."""
+    # again after commit, or a concurrent lookup may memoize the old defaults
+    frappe.cache.delete_keys(_MEMO_KEY.format(""))
+    frappe.db.after_commit.add(lambda: frappe.cache.delete_keys(_MEMO_KEY.format("")))
+
+
+# Item Group defaults child DocType, by its common name first then the older one
+DEFAULTS_DOCTYPES = ("Item Group Defaults", "Item Group Default")
+
+# per-company memo {item_group: default warehouse or ""}
+_MEMO_KEY = "c4pricing:ig_default_wh:{}"
+
+
+def _company_group_defaults(item_groups, company: str | None) -> dict:
+    """{item_group: warehouse} for one company, from the memo; misses resolved in one pass."""
+    groups = list(dict.fromkeys(item_groups))
+    key = _MEMO_KEY.format(company or "")
+
+    out, missing = {}, []
+    for g in groups:
+        wh = frappe.cache.hget(key, g)
+        if wh is None:
+            missing.append(g)
+        else:
+            out[g] = wh
+
+    if missing:
+        defaults = _group_defaults(missing)
+        for g in missing:
+            out[g] = _default_warehouse(g, company, defaults) or ""
+            frappe.cache.hset(key, g, out[g])
+    return out
 
 
 def _get_item_group_default_warehouse(item_code: str, company: str | None) -> str | None:
@@ -89,27 +168,64 @@ def _get_item_group_default_warehouse(item_code: str, company: str | None) -> st
     ig = frappe.db.get_value("Item", item_code, "item_group")
     if not ig:
         return None
-
-    # حاول باسم الدكتايب الشائع "Item Group Defaults"
-    wh = _child_default_wh("Item Group Defaults", ig, company)
-    if wh:
-        return wh
-
-    # احتياطي لو كان الاسم في إصدارك "Item Group Default"
-    wh = _child_default_wh("Item Group Default", ig, company)
-    return wh
-
-
-def _child_default_wh(child_dt: str, parent: str, company: str | None) -> str | None:
-    try:
-        filters = {"parent": parent}
-        if company:
-            filters["company"] = company
-            rows = frappe.get_all(child_dt, filters=filters, fields=["default_warehouse"], limit=1)
-            if rows:
-                return rows[0].get("default_warehouse")
-        # لو مفيش صف على نفس الشركة، خد أي صف أولي
-        rows = frappe.get_all(child_dt, filters={"parent": parent}, fields=["default_warehouse"], limit=1)
-        return rows[0].get("default_warehouse") if rows else None
-    except Exception:
+    return _company_group_defaults([ig], company).get(ig) or None
+
+
+def _item_meta(item_codes, stats=None) -> dict:
+    """{item_code: {stock_uom, item_group}} in one query."""
+    codes = list(dict.fromkeys(item_codes))
+    if not codes:
+        return {}
+    if stats is not None:
+        stats["queries"] += 1
+    rows = frappe.get_all(
+        "Item",
+        filters={"name": ["in", codes]},
+        fields=["name", "stock_uom", "item_group"],
+    )
+    return {r.name: r for r in rows}
+
+
+def _group_defaults(item_groups, stats=None) -> dict:
+    """
+    {child DocType: (first row per (group, company), first row per group)} for the
+    given Item Groups, one query per DocType. "First" is the default get_all order,
+    as the per-item lookups used.
+    """
+    groups = list(dict.fromkeys(item_groups))
+    out = {}
+    if not groups:
+        return out
+
+    for child_dt in DEFAULTS_DOCTYPES:
+        by_company, by_group = {}, {}
+        # ERPNext ships only one of the two names
+        if frappe.db.table_exists(child_dt):
+            if stats is not None:
+                stats["queries"] += 1
+            for r in frappe.get_all(
+                child_dt,
+                filters={"parent": ["in", groups]},
+                fields=["parent", "company", "default_warehouse"],
+            ):
+                by_company.setdefault((r.parent, r.company), r.default_warehouse)
+                by_group.setdefault(r.parent, r.default_warehouse)
+        out[child_dt] = (by_company, by_group)
+    return out
+
+
+def _default_warehouse(item_group: str | None, company: str | None, group_defaults: dict) -> str | None:
+    """Default warehouse of an Item Group from prefetched defaults (see _group_defaults)."""
+    if not item_group:
         return None
+
+    for child_dt in DEFAULTS_DOCTYPES:
+        by_company, by_group = group_defaults.get(child_dt) or ({}, {})
+        # a row for the company wins; otherwise any row of the group
+        if company and (item_group, company) in by_company:
+            wh = by_company[(item_group, company)]
+        else:
+            wh = by_group.get(item_group)
+        if wh:
+            return wh
+    return None
@@ -0,0 +1,154 @@
+# c4pricing/api/thumbnails.py
+from __future__ import annotations
+
+import os
+from urllib.parse import quote, unquote
+
+import frappe
+from frappe.utils import cint
+
+# ---------------------------------------------------------------------------
+# Small WebP variants of Item images for the Opportunity item selector.
+#
+# Only public site files (/files/...) get thumbnails. The thumbnail URL is
+# derived from the image URL alone, so the browser can compute it without
+# asking the server:
+#
+#   /files/photos/door 1.jpg  ->  /files/c4pricing_thumbs/photos__door 1.jpg.webp
+#
+# Thumbnails are written when an Item image is attached (background job),
+# by `bench c4pricing-thumbnails` for existing items, and lazily by
+# get_thumbnail() for anything still missing.
+# ---------------------------------------------------------------------------
+
+THUMB_FOLDER = "c4pricing_thumbs"
+THUMB_SIZE = (320, 320)
+THUMB_QUALITY = 80
+
+_BACKFILL_CHUNK = 500
+
+
+def thumbnail_url(image: str | None) -> str | None:
+    """Deterministic thumbnail URL of a public site image (None for anything else)."""
+    rel = _public_path(image)
+    if not rel:
+        return None
+    return f"/files/{THUMB_FOLDER}/{rel.replace('/', '__')}.webp"
+
+
+def make_thumbnail(image: str, force: bool = False) -> str | None:
+    """Write the thumbnail of `image` unless it exists; returns its URL (None if not possible)."""
+    url = thumbnail_url(image)
+    if not url:
+        return None
+
+    source = frappe.get_site_path("public", "files", _public_path(image))
+    target = frappe.get_site_path("public", url.lstrip("/"))
+    if os.path.exists(target) and not force:
+        return url
+    if not os.path.isfile(source):
+        return None
+
+    from PIL import Image, ImageOps
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with Image.open(source) as im:
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail(THUMB_SIZE)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "A" in im.getbands() else "RGB")
+        # write-then-rename so readers never see a partial file
+        tmp = f"{target}.{os.getpid()}.tmp"
+        im.save(tmp, "WEBP", quality=THUMB_QUALITY, method=4)
+    os.replace(tmp, target)
+    return url
+
+
+# --------------------- Endpoints ---------------------
+
+@frappe.whitelist()
+def get_thumbnail(image: str):
+    """Redirect to the thumbnail of `image`, creating it on first use (original as fallback)."""
+    frappe.has_permission("Item", "read", throw=True)
+    if not frappe.db.exists("Item", {"image": image}):
+        frappe.throw("Not an Item image.", frappe.PermissionError)
+
+    url = None
+    try:
+        url = make_thumbnail(image)
+    except Exception:
+        frappe.log_error(title=f"c4pricing: thumbnail failed for {image}")
+
+    frappe.local.response["type"] = "redirect"
+    frappe.local.response["location"] = quote(url) if url else image
+
+
+@frappe.whitelist()
+def enqueue_thumbnail_backfill(force=0):
+    """Queue thumbnails for every Item image (System Manager)."""
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        "c4pricing.api.thumbnails.backfill",
+        queue="long",
+        timeout=3600,
+        job_id="c4pricing_thumbnail_backfill",
+        deduplicate=True,
+        force=cint(force),
+    )
+
+
+def backfill(force: bool = False) -> dict:
+    """Make sure every Item image has a thumbnail; returns counters."""
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+    last = ""
+    while True:
+        rows = frappe.get_all(
+            "Item",
+            filters={"image": ["like", "/files/%"], "name": [">", last]},
+            fields=["name", "image"],
+            order_by="name asc",
+            limit=_BACKFILL_CHUNK,
+        )
+        if not rows:
+            break
+        for r in rows:
+            _make_counted(r.image, force, counts)
+        last = rows[-1].name
+    return counts
+
+
+# ---- doc_events ---------------------------------------------------------
+
+def on_item_update(doc, method=None):
+    """Item on_update → generate the thumbnail when a public image is attached or replaced."""
+    if not thumbnail_url(doc.get("image")):
+        return
+    if not doc.has_value_changed("image"):
+        return
+
+    frappe.enqueue(
+        "c4pricing.api.thumbnails.make_thumbnail",
+        queue="short",
+        enqueue_after_commit=True,
+        image=doc.image,
+    )
+
+
+# ---- internal helpers -------------------------------------------------
+
+def _public_path(image: str | None) -> str | None:
+    """'dir/file.jpg' for a public /files/ URL; None for private, external or thumbnail URLs."""
+    if not image or not image.startswith("/files/"):
+        return None
+    rel = unquote(image.split("?", 1)[0][len("/files/"):])
+    if not rel or rel.startswith(f"{THUMB_FOLDER}/") or ".." in rel.split("/"):
+        return None
+    return rel
+
+
+def _make_counted(image: str, force: bool, counts: dict):
+    try:
+        counts["done" if make_thumbnail(image, force=force) else "skipped"] += 1
+    except Exception:
+        counts["failed"] += 1
+        frappe.log_error(title=f"c4pricing: thumbnail failed for {image}")
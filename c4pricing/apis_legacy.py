@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import frappe
 from frappe.model.mapper import get_mapped_doc
-from frappe.utils import today, flt
+from frappe.utils import cint, flt, today
 
 
 # ---------- tiny float helper ----------
@@ -71,6 +71,104 @@ def create_boq(source_name: str, item_row):
     return {"name": doc.name}
 
 
+# ---------- All Costing Note rows -> BOQs in one call ----------
+BOQS_CREATED_EVENT = "c4pricing_boqs_created"
+
+
+@frappe.whitelist()
+def create_boqs_for_costing_note(source_name: str, background=0):
+    """
+    Create the missing BOQ of every Costing Note row in a single transaction
+    and link them back. Returns {row name: BOQ name}.
+
+    Existing (costing_note, line_id) BOQs are found with one query, the header
+    is mapped once, and all boq_link values are written with one UPDATE.
+    Pass background=1 to run it as a job for very large notes; the result is
+    then published to the caller as BOQS_CREATED_EVENT.
+    """
+    frappe.has_permission("Costing Note", "write", source_name, throw=True)
+
+    if cint(background):
+        # one job per note: repeated clicks while it is queued do not add more
+        frappe.enqueue(
+            "c4pricing.apis_legacy.create_boqs_job",
+            queue="long",
+            enqueue_after_commit=True,
+            job_id=f"boqs::{source_name}",
+            deduplicate=True,
+            source_name=source_name,
+        )
+        return {"queued": True}
+
+    # serialize concurrent calls for the same note, so two of them cannot
+    # both see a row as missing and create two BOQs for it
+    frappe.db.sql("select name from `tabCosting Note` where name = %s for update", source_name)
+
+    rows = frappe.get_all(
+        "Costing Note Items",
+        filters={"parent": source_name, "parenttype": "Costing Note", "parentfield": "costing_note_items"},
+        fields=["name", "item", "uom", "qty", "boq_link"],
+        order_by="idx asc",
+    )
+
+    existing = {
+        b.line_id: b.name
+        for b in frappe.get_all(
+            "BOQ",
+            filters={"costing_note": source_name, "line_id": ["in", [r.name for r in rows] or [""]]},
+            fields=["name", "line_id"],
+            order_by="creation asc",
+        )
+    }
+
+    missing = [r for r in rows if r.name not in existing]
+    if missing:
+        template = get_mapped_doc("Costing Note", source_name, {"Costing Note": {"doctype": "BOQ"}}, None)
+        header = template.as_dict(no_default_fields=True)
+        header["doctype"] = "BOQ"
+        start = today()
+
+        for row in missing:
+            doc = frappe.get_doc(header)
+            doc.naming_series = "BOQ-.YYYY.-"
+            doc.costing_note = source_name
+            doc.line_id = row.name
+            doc.item = row.item
+            doc.unit = row.uom
+            doc.project_qty = row.qty or 1
+            doc.start_date = start
+            doc.insert(ignore_permissions=True)
+            existing[row.name] = doc.name
+
+    from c4pricing.api.db_utils import bulk_update
+
+    bulk_update(
+        "Costing Note Items",
+        {r.name: {"boq_link": existing[r.name]} for r in rows if r.boq_link != existing.get(r.name)},
+    )
+
+    return {"created": len(missing), "boqs": {r.name: existing[r.name] for r in rows}}
+
+
+def create_boqs_job(source_name: str):
+    """Background create_boqs_for_costing_note; tells the requesting user when it is done."""
+    try:
+        result = create_boqs_for_costing_note(source_name)
+    except Exception:
+        frappe.db.rollback()
+        frappe.publish_realtime(
+            BOQS_CREATED_EVENT, {"costing_note": source_name, "failed": True}, user=frappe.session.user
+        )
+        raise
+
+    frappe.publish_realtime(
+        BOQS_CREATED_EVENT,
+        {"costing_note": source_name, "created": result["created"]},
+        user=frappe.session.user,
+        after_commit=True,
+    )
+
+
 # ---------- Allow 0 prices in Opportunity items ----------
 def opportunity_defaults(doc, method=None):
     for r in getattr(doc, "items", []) or []:
@@ -82,63 +180,22 @@ def opportunity_defaults(doc, method=None):
 # ---------- BOQ -> Costing Note on submit ----------
 def push_boq_to_costing_on_submit(doc, method=None):
     """
-    When a BOQ is submitted, copy its total_cost back to the linked Costing Note row
-    and save the Costing Note.
-    """
-    if not getattr(doc, "costing_note", None) or not getattr(doc, "line_id", None):
-        return
+    When a BOQ is submitted, copy its total_cost back to the linked Costing Note row.
 
-    try:
-        cn = frappe.get_doc("Costing Note", doc.costing_note)
-    except Exception:
-        return
-
-    for row in getattr(cn, "costing_note_items", []):
-        if row.name == doc.line_id:
-            row.cost = _f(doc.total_cost)
-            row.total_cost = _f(row.cost) * _f(row.qty)
-            row.boq_link = doc.name
-            break
+    The update is coalesced per Costing Note in a short background job
+    (see c4pricing.api.costing_rollup) instead of saving the whole note here.
+    """
+    from c4pricing.api.costing_rollup import queue_boq_rollup
 
-    cn.save(ignore_permissions=True)
+    queue_boq_rollup(doc)
 
 
 # ---------- CN -> Opportunity rates on CN submit (optional) ----------
 def update_opportunity_rate_on_cn_submit(doc, method=None):
-    if not getattr(doc, "opportunity", None):
-        return
+    """Kept for callers of the old hook; CostingNote.on_submit now does the push."""
+    from c4pricing.c4pricing.doctype.costing_note.costing_note import push_rates_to_opportunity
 
-    try:
-        opp = frappe.get_doc("Opportunity", doc.opportunity)
-    except Exception:
-        return
-
-    matched = set()
-    for cnr in getattr(doc, "costing_note_items", []):
-        code = cnr.item
-        price = _f(cnr.target_selling_price)
-
-        target = None
-        for it in opp.items:
-            if it.name in matched:
-                continue
-            if it.item_code == code:
-                target = it
-                break
-
-        if not target:
-            idx = (cnr.idx or 1) - 1
-            if 0 <= idx < len(opp.items):
-                target = opp.items[idx]
-
-        if target:
-            target.rate = price
-            target.base_rate = price
-            target.amount = price * _f(target.qty)
-            target.base_amount = target.amount
-            matched.add(target.name)
-
-    opp.save(ignore_permissions=True)
+    push_rates_to_opportunity(doc)
 
 
 # ---------- BOQ totals helper (used by "Update Costs" button) ----------
@@ -180,24 +237,141 @@ def get_boq_totals(boq_name: str):
     }
 
 
+# ---------- Read-only BOQ totals (never saves) ----------
+# BOQ table fieldname -> (child DocType, header total field, has direct_cost/margin)
+BOQ_TOTAL_TABLES = {
+    "material_costs": ("Material costs", "total_material_costs", True),
+    "labor_costs": ("Labor costs", "total_labor_costs", True),
+    "expenses_table": ("Expenses Table", "total_expenses", False),
+    "contractors_table": ("Contractors table", "total_contractors", False),
+}
+
+
+@frappe.whitelist()
+def get_boq_totals_readonly(boq_name: str):
+    """Same totals as get_boq_totals, computed without loading or saving the BOQ."""
+    totals = get_boq_totals_many([boq_name])
+    if boq_name not in totals:
+        frappe.throw(f"BOQ {boq_name} not found")
+    return totals[boq_name]
+
+
+@frappe.whitelist()
+def get_boq_totals_many(boq_names):
+    """
+    Totals for many BOQs in one round trip: {boq_name: {total_*: ...}}.
+
+    Submitted BOQs return their stored header totals (computed on validate and
+    locked afterwards); drafts are summed from the child rows with one SQL SUM
+    per child table for the whole batch. Nothing is written.
+    """
+    names = frappe.parse_json(boq_names) if isinstance(boq_names, str) else boq_names
+    names = list(dict.fromkeys(n for n in (names or []) if n))
+    if not names:
+        return {}
+
+    header_fields = [total_field for _dt, total_field, _m in BOQ_TOTAL_TABLES.values()]
+    headers = frappe.get_list(
+        "BOQ",
+        filters={"name": ["in", names]},
+        fields=["name", "docstatus"] + header_fields,
+        limit_page_length=0,
+    )
+
+    result = {}
+    drafts = []
+    for h in headers:
+        if h.docstatus == 1:
+            result[h.name] = {f: _f(h.get(f)) for f in header_fields}
+        else:
+            drafts.append(h.name)
+            result[h.name] = {f: 0.0 for f in header_fields}
+
+    if drafts:
+        for parentfield, (child_dt, total_field, has_margin) in BOQ_TOTAL_TABLES.items():
+            # stored total_cost, else cost (or direct_cost + margin%) * qty — as in get_boq_totals
+            unit = (
+                "if(ifnull(cost, 0) != 0, cost, ifnull(direct_cost, 0) * (1 + ifnull(margin, 0) / 100.0))"
+                if has_margin
+                else "ifnull(cost, 0)"
+            )
+            rows = frappe.db.sql(
+                f"""
+                select parent, sum(coalesce(total_cost, {unit} * ifnull(qty, 0))) as total
+                from `tab{child_dt}`
+                where parenttype = 'BOQ' and parentfield = %(parentfield)s and parent in %(parents)s
+                group by parent
+                """,
+                {"parentfield": parentfield, "parents": tuple(drafts)},
+                as_dict=True,
+            )
+            for r in rows:
+                result[r.parent][total_field] = _f(r.total)
+
+    for totals in result.values():
+        totals["total_cost"] = sum(totals[f] for f in header_fields)
+
+    return result
+
+
 # ---------- Opportunity -> Quotation (merge standard + custom table) ----------
 @frappe.whitelist()
 def make_quotation_with_standard(source_name: str, target_doc=None):
     """
-    Create a Quotation from Opportunity, then append rows from the custom
+    Create a Quotation from Opportunity including the rows of the custom
     child table 'custom_standard' (DocType: 'Standard Product').
 
-    - Opportunity.items (core)              -> handled by ERPNext mapper
-    - Opportunity.custom_standard (table)   -> appended here to Quotation.items
+    - Opportunity.custom_standard (table)   -> pre-filled here into Quotation.items
+    - Opportunity.items (core)              -> mapped by ERPNext onto that Quotation
+
+    ERPNext's postprocess then runs set_missing_values and the totals once
+    over every row; afterwards the core rows are moved ahead of the
+    standard ones, as before.
     """
-    # 1) call ERPNext’s original mapper first to bring core Opportunity Items
     from erpnext.crm.doctype.opportunity.opportunity import make_quotation as _core_make_quotation
 
-    qtn = _core_make_quotation(source_name, target_doc=target_doc)
+    if isinstance(target_doc, str):
+        target_doc = frappe.parse_json(target_doc)
+    if isinstance(target_doc, dict):
+        target_doc = frappe.get_doc(target_doc)
+    qtn = target_doc or frappe.new_doc("Quotation")
+    existing = list(qtn.get("items") or [])
+
+    custom_rows = frappe.get_all(
+        "Standard Product",
+        filters={"parent": source_name, "parenttype": "Opportunity", "parentfield": "custom_standard"},
+        fields=["item", "item_name", "description", "uom", "qty", "rate", "amount"],
+        order_by="idx asc",
+    )
+    standard = []
+    for r in custom_rows:
+        # Quotation Item fields; extend if you have custom ones on your site
+        qty = flt(r.get("qty"))
+        rate = flt(r.get("rate"))
+        amount = flt(r.get("amount")) if r.get("amount") not in (None, "") else qty * rate
 
-    # 2) append our custom table rows
-    opp = frappe.get_doc("Opportunity", source_name)
-    custom_rows = getattr(opp, "custom_standard", None) or []  # fieldname on Opportunity
+        standard.append(qtn.append("items", {
+            "item_code": r.get("item"),
+            "item_name": r.get("item_name"),
+            "description": r.get("description"),
+            "uom": r.get("uom"),
+            "conversion_factor": 1,
+            "qty": qty,
+            "rate": rate,
+            "amount": amount,
+        }))
+
+    qtn = _core_make_quotation(source_name, target_doc=qtn)
+
+    if standard:
+        # core rows (appended by the mapper) go ahead of the standard rows
+        prefilled = {id(row) for row in existing + standard}
+        core = [row for row in qtn.items if id(row) not in prefilled]
+        qtn.items = existing + core + standard
+        for idx, row in enumerate(qtn.items, start=1):
+            row.idx = idx
+
+    return qtn
 
     for r in custom_rows:
         # Quotation Item fields; extend if you have custom ones on your site
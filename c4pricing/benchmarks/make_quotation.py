@@ -0,0 +1,131 @@
+# c4pricing/benchmarks/make_quotation.py
+"""Opportunity -> Quotation mapper timings (query count and wall time)."""
+from __future__ import annotations
+
+import frappe
+from frappe.utils import cint, flt
+
+from c4pricing.apis_legacy import make_quotation_with_standard
+
+
+def two_pass(source_name: str, target_doc=None):
+    """
+    The previous implementation: ERPNext mapper and its postprocess, then a
+    second Opportunity load and a second set_missing_values/totals pass.
+    """
+    from erpnext.crm.doctype.opportunity.opportunity import make_quotation as _core_make_quotation
+
+    qtn = _core_make_quotation(source_name, target_doc=target_doc)
+
+    opp = frappe.get_doc("Opportunity", source_name)
+    for r in (opp.get("custom_standard") or []):
+        qty = flt(r.get("qty"))
+        rate = flt(r.get("rate"))
+        amount = flt(r.get("amount")) if r.get("amount") not in (None, "") else qty * rate
+        qtn.append("items", {
+            "item_code": r.get("item"),
+            "item_name": r.get("item_name"),
+            "description": r.get("description"),
+            "uom": r.get("uom"),
+            "conversion_factor": 1,
+            "qty": qty,
+            "rate": rate,
+            "amount": amount,
+        })
+
+    qtn.flags.ignore_permissions = True
+    qtn.run_method("set_missing_values")
+    qtn.calculate_taxes_and_totals()
+    return qtn
+
+
+def run(rows: int = 300, repeat: int = 3) -> dict:
+    """
+    Time the previous and the current Quotation mapper on a synthetic
+    Opportunity with `rows` Standard Product lines. Nothing is kept:
+
+        bench --site <site> execute c4pricing.benchmarks.make_quotation.run --kwargs "{'rows': 300}"
+    """
+    import time
+
+    frappe.only_for("System Manager")
+    rows, repeat = cint(rows) or 300, cint(repeat) or 3
+
+    items = frappe.get_all(
+        "Item",
+        filters={"disabled": 0, "is_sales_item": 1, "has_variants": 0},
+        fields=["name", "item_name", "stock_uom"],
+        limit=rows,
+    )
+    if not items:
+        frappe.throw("No sales items to build a synthetic Opportunity from.")
+
+    lines = [items[i % len(items)] for i in range(rows)]
+
+    frappe.db.savepoint("c4pricing_qtn_benchmark")
+    try:
+        opp = frappe.get_doc({
+            "doctype": "Opportunity",
+            "opportunity_from": "Lead",
+            "party_name": _benchmark_lead(),
+            "company": frappe.defaults.get_user_default("Company"),
+            "custom_standard": [
+                {
+                    "item": it.name,
+                    "item_name": it.item_name,
+                    "uom": it.stock_uom,
+                    "qty": 1 + i % 5,
+                    "rate": 10 + i % 7,
+                }
+                for i, it in enumerate(lines)
+            ],
+        })
+        opp.flags.ignore_permissions = True
+        opp.flags.ignore_mandatory = True
+        opp.insert()
+
+        results = {}
+        for label, fn in (("two_pass", two_pass), ("current", make_quotation_with_standard)):
+            timings, queries, qtn = [], [], None
+            for _ in range(repeat):
+                with _count_queries() as counter:
+                    start = time.perf_counter()
+                    qtn = fn(opp.name)
+                    timings.append(time.perf_counter() - start)
+                queries.append(counter["queries"])
+            results[label] = {
+                "best_s": round(min(timings), 4),
+                "queries": min(queries),
+                "rows": len(qtn.items),
+                "grand_total": flt(qtn.grand_total),
+            }
+        results["rows"] = rows
+        return results
+    finally:
+        frappe.db.rollback(save_point="c4pricing_qtn_benchmark")
+
+
+def _benchmark_lead() -> str:
+    lead = frappe.get_doc({"doctype": "Lead", "lead_name": "c4pricing quotation benchmark"})
+    lead.flags.ignore_permissions = True
+    lead.flags.ignore_mandatory = True
+    lead.insert()
+    return lead.name
+
+
+class _count_queries:
+    """Count frappe.db.sql calls inside the block."""
+    def __enter__(self):
+        self.counter = {"queries": 0}
+        self._sql = frappe.db.sql
+
+        def counted(*args, **kwargs):
+            self.counter["queries"] += 1
+            return self._sql(*args, **kwargs)
+
+        frappe.db.sql = counted
+        return self.counter
+
+    def __exit__(self, *exc):
+        frappe.db.sql = self._sql
+        return False
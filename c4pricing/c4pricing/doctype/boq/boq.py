@@ -5,6 +5,9 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
 
+from c4pricing.api.cost_sources import SOURCES, resolve_rates
+from c4pricing.api.costing_kernel import recalc_margin_rows, recalc_simple_rows
+
 # ---------------------- Core BOQ recalculation ----------------------
 
 # Which field holds the unit cost in each child table
@@ -16,18 +19,41 @@ COST_FIELD_BY_TABLE = {
 }
 
 
+# Header total written by each child table
+TOTAL_FIELD_BY_TABLE = {
+    "material_costs": "total_material_costs",
+    "labor_costs": "total_labor_costs",
+    "expenses_table": "total_expenses",
+    "contractors_table": "total_contractors",
+}
+
+# Tables priced as direct_cost + margin% (the others carry cost directly)
+MARGIN_TABLES = ("material_costs", "labor_costs")
+
+# Row inputs that invalidate cost / total_cost when they change
+TRACKED_ROW_FIELDS = ("qty", "direct_cost", "margin", "cost")
+
+
 class BOQ(Document):
     """Recalculate child rows and roll-up totals."""
 
     def validate(self):
+        before = self.get_doc_before_save()
         # If header margins changed, sync them to all rows (non-ambiguous, per your spec)
-        self._sync_row_margins_if_header_changed()
-        # Always recompute totals
-        self._recalc_all()
+        self._sync_row_margins_if_header_changed(before)
+
+        # New documents (or an explicit request) get a full recompute;
+        # otherwise only changed rows are recomputed and totals move by deltas.
+        if before is None or self.flags.full_recalc:
+            self._recalc_all()
+        else:
+            self._recalc_changed(before)
+            if frappe.flags.c4pricing_check_boq_recalc:
+                self._check_recalc_consistency()
 
     # ---- internal helpers -------------------------------------------------
 
-    def _sync_row_margins_if_header_changed(self):
+    def _sync_row_margins_if_header_changed(self, before=None):
         """
         Force-propagate margins to ALL rows ONLY when header changed since last save.
           - New doc OR base_margin changed  -> set all material_costs.margin = base_margin
@@ -38,11 +64,9 @@ class BOQ(Document):
         base = flt(getattr(self, "base_margin", 0))
         s    = flt(getattr(self, "s_margin", 0))
 
-        if self.name and frappe.db.exists("BOQ", self.name):
-            prev = frappe.db.get_value("BOQ", self.name, ["base_margin", "s_margin"], as_dict=True)
-            if prev:
-                prev_base = flt(prev.get("base_margin"))
-                prev_s    = flt(prev.get("s_margin"))
+        if before is not None:
+            prev_base = flt(before.get("base_margin"))
+            prev_s    = flt(before.get("s_margin"))
 
         base_changed = (prev_base is None) or (flt(prev_base) != base)
         s_changed    = (prev_s is None) or (flt(prev_s) != s)
@@ -55,6 +79,58 @@ class BOQ(Document):
             for d in (self.get("labor_costs") or []):
                 d.margin = s
 
+    def _recalc_changed(self, before):
+        """
+        Recompute only rows whose qty/direct_cost/margin/cost differ from the saved
+        version and move each table total by (new row total - old row total).
+        Added rows add their total, removed rows subtract theirs.
+        """
+        for table, total_field in TOTAL_FIELD_BY_TABLE.items():
+            old_rows = {d.name: d for d in (before.get(table) or [])}
+            total = flt(before.get(total_field))
+
+            changed = []
+            for d in (self.get(table) or []):
+                old = old_rows.pop(d.name, None)
+                if old is not None and not _row_changed(d, old):
+                    continue
+                total -= flt(old.total_cost) if old is not None else 0.0
+                changed.append(d)
+
+            # rows deleted since the last save
+            for old in old_rows.values():
+                total -= flt(old.total_cost)
+
+            if table in MARGIN_TABLES:
+                total += self._recalc_mat_or_lab(changed, percent_field="margin")
+            else:
+                total += self._recalc_simple(changed)
+
+            self.set(total_field, total)
+
+        self.total_cost = (
+            flt(self.total_material_costs)
+            + flt(self.total_labor_costs)
+            + flt(self.total_expenses)
+            + flt(self.total_contractors)
+        )
+
+    def _check_recalc_consistency(self):
+        """Compare the incremental result with a full recompute (enable with frappe.flags.c4pricing_check_boq_recalc)."""
+        fields = list(TOTAL_FIELD_BY_TABLE.values()) + ["total_cost"]
+        incremental = {f: flt(self.get(f)) for f in fields}
+
+        self._recalc_all()
+
+        precision = self.precision("total_cost") or 2
+        drift = {
+            f: (incremental[f], flt(self.get(f)))
+            for f in fields
+            if flt(incremental[f], precision) != flt(self.get(f), precision)
+        }
+        if drift:
+            frappe.throw(f"BOQ {self.name}: incremental totals differ from full recompute: {drift}")
+
     def _recalc_all(self):
         total_material = self._recalc_mat_or_lab(self.get("material_costs"), percent_field="margin")
         total_labor = self._recalc_mat_or_lab(self.get("labor_costs"), percent_field="margin")
@@ -71,145 +147,41 @@ class BOQ(Document):
     @staticmethod
     def _recalc_mat_or_lab(rows, percent_field="margin"):
         """Rows that have direct_cost + margin% -> cost -> total_cost."""
-        if not rows:
-            return 0.0
-
-        table_sum = 0.0
-        for d in rows:
-            dc = flt(d.get("direct_cost"))
-            margin_pct = flt(d.get(percent_field))
-            qty = flt(d.get("qty") or 0)
-
-            cost = dc + (dc * margin_pct / 100.0)
-            d.cost = cost
-            d.total_cost = cost * qty
-            table_sum += d.total_cost
-
-        return table_sum
+        return recalc_margin_rows(rows, percent_field=percent_field)
 
     @staticmethod
     def _recalc_simple(rows):
         """Rows that have cost only -> total_cost."""
-        if not rows:
-            return 0.0
-
-        table_sum = 0.0
-        for d in rows:
-            cost = flt(d.get("cost"))
-            qty = flt(d.get("qty") or 0)
-            d.total_cost = cost * qty
-            table_sum += d.total_cost
-
-        return table_sum
-
+        return recalc_simple_rows(rows)
 
-# --------------------- Cost source utilities ---------------------
-
-def _latest_buying_price(item_code: str, price_list: str) -> float:
-    """Return latest *buying* Item Price from the given Price List."""
-    if not item_code:
-        return 0.0
-
-    rec = frappe.get_all(
-        "Item Price",
-        filters={"item_code": item_code, "price_list": price_list, "buying": 1},
-        fields=["price_list_rate", "valid_from", "modified"],
-        order_by="valid_from desc, modified desc",
-        limit=1,
-    )
-    if rec:
-        return flt(rec[0].get("price_list_rate"))
-    return 0.0
-
-
-def _valuation_rate(item_code: str, warehouse: str | None = None, company: str | None = None) -> float:
-    """Get a reasonable valuation rate for the item (Bin / SLE / ERPNext stock utils)."""
-    if not item_code:
-        return 0.0
-
-    # Preferred: ERPNext stock utils
-    try:
-        from erpnext.stock.utils import get_valuation_rate
-        rate = get_valuation_rate(
-            item_code=item_code,
-            warehouse=warehouse,
-            company=company,
-            qty=0,
-            rate=0,
-            voucher_type=None,
-            voucher_no=None,
-        ) or 0
-        if rate:
-            return flt(rate)
-    except Exception:
-        pass
-
-    # Fallback A: latest Bin valuation_rate
-    try:
-        bin_filters = {"item_code": item_code}
-        if warehouse:
-            bin_filters["warehouse"] = warehouse
-        rec = frappe.get_all(
-            "Bin",
-            filters=bin_filters,
-            fields=["valuation_rate"],
-            order_by="modified desc",
-            limit=1,
-        )
-        if rec and rec[0].get("valuation_rate"):
-            return flt(rec[0]["valuation_rate"])
-    except Exception:
-        pass
-
-    # Fallback B: last SLE with a valuation_rate
-    try:
-        sle_filters = {"item_code": item_code}
-        if warehouse:
-            sle_filters["warehouse"] = warehouse
-        rec = frappe.get_all(
-            "Stock Ledger Entry",
-            filters=sle_filters,
-            fields=["valuation_rate"],
-            order_by="posting_date desc, posting_time desc, creation desc",
-            limit=1,
-        )
-        if rec and rec[0].get("valuation_rate"):
-            return flt(rec[0]["valuation_rate"])
-    except Exception:
-        pass
 
-    return 0.0
+def _row_changed(d, old) -> bool:
+    """True when any cost input of a child row differs from its saved version."""
+    return any(flt(d.get(f)) != flt(old.get(f)) for f in TRACKED_ROW_FIELDS)
 
 
-def _last_purchase_rate(item_code: str) -> float:
-    """Return last purchase rate from Purchase Invoice Item or Purchase Receipt Item."""
-    if not item_code:
-        return 0.0
+# --------------------- Update Costs ---------------------
 
-    rec = frappe.get_all(
-        "Purchase Invoice Item",
-        filters={"item_code": item_code},
-        fields=["rate"],
-        order_by="creation desc",
-        limit=1,
-    )
-    if rec and rec[0].get("rate"):
-        return flt(rec[0].rate)
-
-    rec = frappe.get_all(
-        "Purchase Receipt Item",
-        filters={"item_code": item_code},
-        fields=["rate"],
-        order_by="creation desc",
-        limit=1,
-    )
-    if rec and rec[0].get("rate"):
-        return flt(rec[0].rate)
+def cost_rows(doc):
+    """(row, target_field) for every costed child row: material/labor → direct_cost, expenses/contractors → cost."""
+    return [
+        (r, target_field)
+        for table, target_field in COST_FIELD_BY_TABLE.items()
+        for r in (doc.get(table) or [])
+        if r.get("item")
+    ]
 
-    return 0.0
 
+def apply_rates(rows, rates) -> int:
+    """Write resolved rates into (row, target_field) pairs. Returns how many values changed."""
+    changed = 0
+    for r, target_field in rows:
+        val = rates.get(r.item, 0.0)
+        if flt(r.get(target_field)) != flt(val):
+            changed += 1
+        r.set(target_field, val)
+    return changed
 
-# --------------------- Update Costs ---------------------
 
 @frappe.whitelist()
 def update_boq_costs(
@@ -227,38 +199,25 @@ def update_boq_costs(
 
     Then recompute row totals and header totals (margins already synced on validate).
     """
-    if source not in ("price_list", "valuation", "last_purchase"):
+    if source not in SOURCES:
         source = "price_list"
 
     doc = frappe.get_doc("BOQ", name)
-    updated = 0
-
-    def set_row_cost(row, target_field: str):
-        nonlocal updated
-        if not row.get("item"):
-            return
-
-        if source == "price_list":
-            val = _latest_buying_price(row.item, price_list)
-        elif source == "valuation":
-            val = _valuation_rate(row.item, warehouse=warehouse, company=company)
-        elif source == "last_purchase":
-            val = _last_purchase_rate(row.item)
-        else:
-            val = 0
-
-        row.set(target_field, val)
-        updated += 1
 
-    # material/labor → direct_cost
-    for table in ("material_costs", "labor_costs"):
-        for r in doc.get(table) or []:
-            set_row_cost(r, "direct_cost")
-
-    # expenses/contractors → cost
-    for table in ("expenses_table", "contractors_table"):
-        for r in doc.get(table) or []:
-            set_row_cost(r, "cost")
+    rows = cost_rows(doc)
+
+    # one set-based lookup for all distinct items, fanned back out to rows
+    provenance = {}
+    rates, queries = resolve_rates(
+        [r.item for r, _ in rows],
+        source=source,
+        price_list=price_list,
+        warehouse=warehouse,
+        company=company,
+        provenance=provenance,
+    )
+    apply_rates(rows, rates)
+    updated = len(rows)
 
     # Recompute totals; margins will be enforced on next validate if headers change
     doc._recalc_all()
@@ -271,4 +230,7 @@ def update_boq_costs(
         "warehouse": warehouse,
         "company": company,
         "new_total_cost": float(doc.total_cost or 0),
+        "queries": queries,
+        # where each item's rate came from (None = no rate found)
+        "provenance": provenance,
     }
@@ -0,0 +1,87 @@
+frappe.listview_settings["BOQ"] = {
+  onload(listview) {
+    // Reprice many draft BOQs in background jobs instead of opening each one
+    listview.page.add_inner_button(__("Reprice Draft BOQs"), () => {
+      const dialog = new frappe.ui.Dialog({
+        title: __("Reprice Draft BOQs"),
+        fields: [
+          { label: __("Costing Note"), fieldname: "costing_note", fieldtype: "Link", options: "Costing Note" },
+          { label: __("Project"), fieldname: "project", fieldtype: "Link", options: "Project" },
+          { label: __("Cost Type"), fieldname: "cost_type", fieldtype: "Link", options: "Cost Type" },
+          {
+            label: __("All Draft BOQs"),
+            fieldname: "all_drafts",
+            fieldtype: "Check",
+            description: __("Ignore the filters above and reprice every draft BOQ"),
+            hidden: !frappe.user.has_role("System Manager"),
+          },
+          { fieldtype: "Section Break" },
+          {
+            label: __("Source"),
+            fieldname: "source",
+            fieldtype: "Select",
+            options: [
+              { label: __("Price List"), value: "price_list" },
+              { label: __("Valuation Rate"), value: "valuation" },
+              { label: __("Last Purchase Rate"), value: "last_purchase" },
+            ],
+            default: "price_list",
+            reqd: 1,
+          },
+          {
+            label: __("Price List"),
+            fieldname: "price_list",
+            fieldtype: "Link",
+            options: "Price List",
+            default: "Standard Buying",
+            depends_on: "eval:doc.source=='price_list'",
+          },
+        ],
+        primary_action_label: __("Reprice"),
+        primary_action: async (values) => {
+          const r = await frappe.call({
+            method: "c4pricing.api.boq_refresh.enqueue_bulk_cost_refresh",
+            args: {
+              costing_note: values.costing_note || null,
+              project: values.project || null,
+              cost_type: values.cost_type || null,
+              all_drafts: values.all_drafts ? 1 : 0,
+              source: values.source || "price_list",
+              price_list: values.price_list || "Standard Buying",
+            },
+            freeze: true,
+          });
+          dialog.hide();
+          if (!r.message) return;
+
+          const log = r.message.log;
+          frappe.show_alert({
+            message: __("Repricing {0} BOQs in the background ({1})", [r.message.boqs, log]),
+            indicator: "blue",
+          });
+
+          const on_progress = (data) => {
+            if (!data || data.log !== log) return;
+            frappe.show_progress(__("Repricing BOQs"), data.done, data.total, __("{0} rows changed", [data.rows_changed]));
+            if (data.status !== "Running") {
+              frappe.hide_progress();
+              frappe.realtime.off("c4pricing_boq_cost_refresh", on_progress);
+              frappe.msgprint(
+                __("{0}: {1} BOQs processed, {2} failed<br>Rows changed: {3}<br>Total delta: {4}", [
+                  data.status,
+                  data.done - data.failed,
+                  data.failed,
+                  data.rows_changed,
+                  format_currency(data.total_delta),
+                ])
+              );
+              listview.refresh();
+            }
+          };
+          frappe.realtime.on("c4pricing_boq_cost_refresh", on_progress);
+        },
+      });
+      dialog.show();
+    });
+  },
+};
@@ -1,9 +1,97 @@
 # Copyright (c) 2024, Jenan Alfahham and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from erpnext.stock.doctype.item.test_item import make_item
+
+TEST_CUSTOMER = "_Test BOQ Customer"
+TEST_ITEMS = ("_Test BOQ Material", "_Test BOQ Labor", "_Test BOQ Expense", "_Test BOQ Contractor")
+
 
 class TestBOQ(FrappeTestCase):
-	pass
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		for item_code in TEST_ITEMS:
+			make_item(item_code, {"is_stock_item": 0})
+		if not frappe.db.exists("Customer", TEST_CUSTOMER):
+			frappe.get_doc({"doctype": "Customer", "customer_name": TEST_CUSTOMER}).insert()
+
+	def setUp(self):
+		# cross-check incremental BOQ totals against a full recompute on every save
+		frappe.flags.c4pricing_check_boq_recalc = True
+
+	def tearDown(self):
+		frappe.flags.c4pricing_check_boq_recalc = False
+		frappe.db.rollback()
+
+	def test_new_boq_totals(self):
+		boq = make_boq()
+
+		self.assertEqual(boq.material_costs[0].margin, 10)
+		self.assertEqual(boq.labor_costs[0].margin, 20)
+		self.assertTotals(boq, material=220, labor=180, expenses=20, contractors=7)
+
+	def test_edit_row(self):
+		boq = make_boq()
+		boq.material_costs[0].qty = 5
+		boq.save()
+
+		self.assertEqual(boq.material_costs[0].total_cost, 550)
+		self.assertTotals(boq, material=550, labor=180, expenses=20, contractors=7)
+
+	def test_add_row(self):
+		boq = make_boq()
+		boq.append("expenses_table", {"item": TEST_ITEMS[2], "uom": "Nos", "qty": 1, "cost": 10})
+		boq.save()
+
+		self.assertTotals(boq, material=220, labor=180, expenses=30, contractors=7)
+
+	def test_delete_row(self):
+		boq = make_boq()
+		boq.set("labor_costs", [])
+		boq.save()
+
+		self.assertTotals(boq, material=220, labor=0, expenses=20, contractors=7)
+
+	def test_header_margin_change(self):
+		boq = make_boq()
+		boq.material_costs[0].margin = 30  # row edit, kept while the header is unchanged
+		boq.save()
+		self.assertTotals(boq, material=260, labor=180, expenses=20, contractors=7)
+
+		boq.base_margin = 50
+		boq.save()
+
+		self.assertEqual(boq.material_costs[0].margin, 50)
+		self.assertEqual(boq.material_costs[0].cost, 150)
+		self.assertTotals(boq, material=300, labor=180, expenses=20, contractors=7)
+
+	def assertTotals(self, boq, material, labor, expenses, contractors):
+		self.assertAlmostEqual(boq.total_material_costs, material)
+		self.assertAlmostEqual(boq.total_labor_costs, labor)
+		self.assertAlmostEqual(boq.total_expenses, expenses)
+		self.assertAlmostEqual(boq.total_contractors, contractors)
+		self.assertAlmostEqual(boq.total_cost, material + labor + expenses + contractors)
+
+		# what was saved, not only what is in memory
+		saved = frappe.db.get_value("BOQ", boq.name, "total_cost")
+		self.assertAlmostEqual(saved, material + labor + expenses + contractors)
+
+
+def make_boq():
+	return frappe.get_doc(
+		{
+			"doctype": "BOQ",
+			"party_type": "Customer",
+			"party_name": TEST_CUSTOMER,
+			"base_margin": 10,
+			"s_margin": 20,
+			"material_costs": [{"item": TEST_ITEMS[0], "qty": 2, "direct_cost": 100}],
+			"labor_costs": [{"item": TEST_ITEMS[1], "uom": "Nos", "qty": 3, "direct_cost": 50}],
+			"expenses_table": [{"item": TEST_ITEMS[2], "uom": "Nos", "qty": 4, "cost": 5}],
+			"contractors_table": [{"item": TEST_ITEMS[3], "uom": "Nos", "qty": 1, "cost": 7}],
+		}
+	).insert()
@@ -0,0 +1,10 @@
+# Copyright (c) 2026, Connect 4 Systems
+from __future__ import annotations
+
+from frappe.model.document import Document
+
+
+class BOQCostRefresh(Document):
+    """Summary of one bulk BOQ cost refresh; counters are updated by c4pricing.api.boq_refresh."""
+
+    pass
@@ -0,0 +1,9 @@
+# Copyright (c) 2026, Connect 4 Systems
+# See license.txt
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+
+class TestBOQCostRefresh(FrappeTestCase):
+	pass
@@ -11,6 +11,88 @@ function compute_tsp(cost, marginPct) {
   return F(cost) * (1 + F(marginPct) / 100.0);
 }
 
+// pull total_cost of all linked BOQs (read-only, batched) into the rows
+function refresh_boq_costs(frm) {
+  var rows = (frm.doc.costing_note_items || []).filter(function (r) {
+    return r.boq_link;
+  });
+  if (!rows.length) return;
+
+  frappe.call({
+    method: "c4pricing.api.get_boq_totals_many",
+    args: {
+      boq_names: rows.map(function (r) {
+        return r.boq_link;
+      }),
+    },
+    freeze: true,
+    callback: function (r) {
+      var totals = (r && r.message) || {};
+      var changed = 0;
+      rows.forEach(function (row) {
+        var t = totals[row.boq_link];
+        if (!t) return;
+        var tc = F(t.total_cost);
+        if (F(row.cost) === tc) return;
+        row.cost = tc;
+        row.total_cost = tc * F(row.qty);
+        if (row.target_selling_price === undefined || row.target_selling_price === null || row.target_selling_price === "") {
+          row.target_selling_price = compute_tsp(tc, frm.doc.default_profit_margin || 0);
+        }
+        changed++;
+      });
+      if (changed) {
+        frm.refresh_field("costing_note_items");
+        frm.dirty();
+      }
+      frappe.show_alert({ message: __("{0} rows updated from BOQs", [changed]), indicator: "green" });
+    },
+  });
+}
+
+// create BOQs for every row without one and link them back
+async function create_all_boqs(frm) {
+  if (frm.is_dirty()) {
+    await frm.save();
+  }
+  var missing = (frm.doc.costing_note_items || []).filter(function (row) {
+    return !row.boq_link;
+  });
+  frappe.call({
+    method: "c4pricing.api.create_boqs_for_costing_note",
+    // many BOQs to create: do it in a background job
+    args: { source_name: frm.doc.name, background: missing.length > 200 ? 1 : 0 },
+    freeze: true,
+    freeze_message: __("Creating BOQs..."),
+    callback: function (r) {
+      if (!r || !r.message) return;
+      if (r.message.queued) {
+        frappe.show_alert({ message: __("BOQs are being created in the background"), indicator: "blue" });
+        notify_when_boqs_created(frm);
+        return;
+      }
+      frappe.show_alert({ message: __("{0} BOQs created", [r.message.created]), indicator: "green" });
+      frm.reload_doc();
+    },
+  });
+}
+
+// background create_all_boqs: report and reload once the job is done
+function notify_when_boqs_created(frm) {
+  var name = frm.doc.name;
+  var on_done = function (data) {
+    if (!data || data.costing_note !== name) return;
+    frappe.realtime.off("c4pricing_boqs_created", on_done);
+    if (data.failed) {
+      frappe.msgprint({ message: __("Creating BOQs for {0} failed. See the Error Log.", [name]), indicator: "red" });
+      return;
+    }
+    frappe.show_alert({ message: __("{0} BOQs created", [data.created]), indicator: "green" });
+    if (frm.doc.name === name) frm.reload_doc();
+  };
+  frappe.realtime.on("c4pricing_boqs_created", on_done);
+}
+
 frappe.ui.form.on("Costing Note", {
   onload: function (frm) {
     // remember previously applied parent margin (for non-invasive updates)
@@ -42,6 +124,20 @@ frappe.ui.form.on("Costing Note", {
       console.warn("Failed to set boq_link filter:", e);
     }
 
+    // refresh every linked BOQ cost in one round trip
+    if (frm.doc.docstatus === 0) {
+      frm.add_custom_button(__("Refresh BOQ Costs"), function () {
+        refresh_boq_costs(frm);
+      });
+    }
+
+    // create the missing BOQ of every row in one call
+    if (!frm.is_new()) {
+      frm.add_custom_button(__("Create All BOQs"), function () {
+        create_all_boqs(frm);
+      });
+    }
+
     // one-time gentle backfill: if a row TSP is blank, fill it from current parent margin
     try {
       (frm.doc.costing_note_items || []).forEach(function (r) {
@@ -129,7 +225,7 @@ frappe.ui.form.on("Costing Note Items", {
 
     try {
       await frappe.call({
-        method: "c4pricing.api.get_boq_totals",
+        method: "c4pricing.api.get_boq_totals_readonly",
         args: { boq_name: row.boq_link },
         callback: function (r) {
           if (!r || !r.message) return;
@@ -1,6 +1,8 @@
 # Copyright (c) 2025, Connect 4 Systems
 from __future__ import annotations
 
+from collections import deque
+
 import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
@@ -36,21 +38,12 @@ class CostingNote(Document):
           2) self.default_profit_margin (if you add a parent field later)
           3) self.profit_margin (existing parent field)
         """
-        return flt(
-            row.get("default_profit_margin", None)
-            or getattr(self, "default_profit_margin", None)
-            or getattr(self, "profit_margin", 0)
-        )
+        return row_margin(row, self)
 
     def _update_target_selling_prices(self):
         """target_selling_price = cost + (cost * (margin / 100))."""
         for row in (self.get("costing_note_items") or []):
-            cost = flt(row.get("cost"))
-            if not cost:
-                row.target_selling_price = 0.0
-                continue
-            margin = self._row_margin(row)
-            row.target_selling_price = cost + (cost * margin / 100.0)
+            row.target_selling_price = target_selling_price(row.get("cost"), self._row_margin(row))
 
     def _rollup_totals(self):
         """Compute per-row totals and roll them up to the parent."""
@@ -78,30 +71,103 @@ class CostingNote(Document):
 
     def _push_to_opportunity(self):
         """On submit → push Opportunity Item rates from target_selling_price."""
-        if not getattr(self, "opportunity", None):
-            return
-
-        opp = frappe.get_doc("Opportunity", self.opportunity)
-        if not getattr(opp, "items", None):
-            return
-
-        rate_by_item = {
-            row.get("item"): flt(row.get("target_selling_price"))
-            for row in (self.get("costing_note_items") or [])
-            if row.get("item")
-        }
-
-        changed = False
-        for it in opp.items:
-            if it.item_code in rate_by_item:
-                new_rate = rate_by_item[it.item_code]
-                if flt(it.rate) != new_rate:
-                    it.rate = new_rate
-                    it.base_rate = new_rate
-                    it.amount = new_rate * flt(it.qty or 0)
-                    it.base_amount = it.amount
-                    changed = True
-
-        if changed:
-            opp.flags.ignore_permissions = True
-            opp.save()
+        push_rates_to_opportunity(self)
+
+
+# ---------------- shared formulas ----------------
+# Also used by the coalesced BOQ rollup, which works on plain rows instead of
+# a loaded Costing Note.
+
+def row_margin(row, parent) -> float:
+    """Row margin, else parent default_profit_margin, else parent profit_margin."""
+    return flt(
+        row.get("default_profit_margin", None)
+        or getattr(parent, "default_profit_margin", None)
+        or getattr(parent, "profit_margin", 0)
+    )
+
+
+def target_selling_price(cost, margin) -> float:
+    """cost + (cost * margin / 100); 0 when there is no cost."""
+    cost = flt(cost)
+    if not cost:
+        return 0.0
+    return cost + (cost * flt(margin) / 100.0)
+
+
+# ---------------- Opportunity rate push ----------------
+
+def push_rates_to_opportunity(cn) -> bool:
+    """
+    Push target_selling_price of each costing row to the linked Opportunity Items.
+
+    Matching, in costing-row order:
+      1) the first not-yet-matched Opportunity Item with the same item_code
+      2) else the Opportunity Item at the costing row's idx
+    Opportunity Items left unmatched but sharing an item_code with a costing row
+    get the rate of the last such row. Only rows whose values change are
+    touched, and the Opportunity is saved at most once.
+    Returns True when the Opportunity was saved.
+    """
+    if not getattr(cn, "opportunity", None):
+        return False
+
+    opp = frappe.get_doc("Opportunity", cn.opportunity)
+    items = list(getattr(opp, "items", None) or [])
+    if not items:
+        return False
+
+    cn_rows = cn.get("costing_note_items") or []
+
+    # item_code -> Opportunity Items in order, built once
+    by_code = {}
+    for it in items:
+        by_code.setdefault(it.item_code, deque()).append(it)
+
+    price_by_row = {}
+    matched = set()
+    for cnr in cn_rows:
+        target = None
+        queue = by_code.get(cnr.get("item"))
+        while queue:
+            it = queue.popleft()
+            if it.name not in matched:
+                target = it
+                break
+
+        if not target:
+            idx = (cnr.idx or 1) - 1
+            if 0 <= idx < len(items):
+                target = items[idx]
+
+        if target:
+            price_by_row[target.name] = flt(cnr.get("target_selling_price"))
+            matched.add(target.name)
+
+    # unmatched rows with a costed item_code: last costing row of that code wins
+    rate_by_item = {row.get("item"): flt(row.get("target_selling_price")) for row in cn_rows if row.get("item")}
+
+    changed = False
+    for it in items:
+        if it.name in price_by_row:
+            price = price_by_row[it.name]
+        elif it.item_code in rate_by_item:
+            price = rate_by_item[it.item_code]
+        else:
+            continue
+        changed |= _set_rate(it, price)
+
+    if changed:
+        opp.flags.ignore_permissions = True
+        opp.save()
+    return changed
+
+
+def _set_rate(it, price: float) -> bool:
+    """Write rate / amount (and base_*) of an Opportunity Item; True if anything changed."""
+    amount = price * flt(it.qty or 0)
+    values = {"rate": price, "base_rate": price, "amount": amount, "base_amount": amount}
+    if all(flt(it.get(f)) == v for f, v in values.items()):
+        return False
+    it.update(values)
+    return True
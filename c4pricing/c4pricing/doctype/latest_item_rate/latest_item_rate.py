@@ -0,0 +1,13 @@
+# Copyright (c) 2026, Connect 4 Systems
+from __future__ import annotations
+
+from frappe.model.document import Document
+
+from c4pricing.api.cost_sources import snapshot_key
+
+
+class LatestItemRate(Document):
+    """One row per (item, source, scope) holding the current rate; maintained by rate_snapshot.py."""
+
+    def autoname(self):
+        self.name = snapshot_key(self.source, self.scope, self.item_code)
@@ -0,0 +1,56 @@
+# c4pricing/commands.py
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-rate-snapshot")
+@click.option(
+    "--source",
+    "sources",
+    multiple=True,
+    type=click.Choice(["price_list", "valuation", "last_purchase"]),
+    help="Only rebuild the given source (repeatable). Default: all sources.",
+)
+@pass_context
+def rebuild_rate_snapshot(context, sources=None):
+    """Rebuild the Latest Item Rate snapshot from the transaction tables."""
+    import frappe
+
+    from c4pricing.api.rate_snapshot import rebuild
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        written = rebuild(list(sources) or None)
+        frappe.db.commit()
+    finally:
+        frappe.destroy()
+
+    for source, count in written.items():
+        click.echo(f"{source}: {count} rows")
+
+
+@click.command("c4pricing-thumbnails")
+@click.option("--force", is_flag=True, default=False, help="Regenerate existing thumbnails too.")
+@pass_context
+def make_thumbnails(context, force=False):
+    """Create selector thumbnails for all Item images."""
+    import frappe
+
+    from c4pricing.api.thumbnails import backfill
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        counts = backfill(force=force)
+        frappe.db.commit()
+    finally:
+        frappe.destroy()
+
+    for key, count in counts.items():
+        click.echo(f"{key}: {count}")
+
+
+commands = [rebuild_rate_snapshot, make_thumbnails]
@@ -21,14 +21,61 @@ doc_events = {
     "BOQ": {
         "on_submit": "c4pricing.api.push_boq_to_costing_on_submit",
     },
-    "Costing Note": {
-        "on_submit": "c4pricing.api.update_opportunity_rate_on_cn_submit",
-    },
     "Item": {
         "before_insert": "c4pricing.overrides.item_naming.before_insert_set_code",
         
         # (optional) keep your flags enforcer if you use it:
         # "validate": "c4pricing.overrides.item_flags.enforce_flags_by_item_type",
+        "on_update": "c4pricing.api.thumbnails.on_item_update",
+        "on_trash": "c4pricing.api.code_meta_cache.invalidate",
+        "after_rename": "c4pricing.api.code_meta_cache.invalidate",
+    },
+    # item-code metadata cache
+    "Brand": {
+        "on_update": "c4pricing.api.code_meta_cache.invalidate",
+        "on_trash": "c4pricing.api.code_meta_cache.invalidate",
+        "after_rename": "c4pricing.api.code_meta_cache.invalidate",
+    },
+    "Item Group": {
+        "on_update": [
+            "c4pricing.api.code_meta_cache.invalidate",
+            "c4pricing.api.item_group_filters.clear_tree_cache",
+            "c4pricing.api.stock_entry.clear_group_default_cache",
+        ],
+        "on_trash": [
+            "c4pricing.api.code_meta_cache.invalidate",
+            "c4pricing.api.item_group_filters.clear_tree_cache",
+            "c4pricing.api.stock_entry.clear_group_default_cache",
+        ],
+        "after_rename": [
+            "c4pricing.api.code_meta_cache.invalidate",
+            "c4pricing.api.item_group_filters.clear_tree_cache",
+            "c4pricing.api.stock_entry.clear_group_default_cache",
+        ],
+    },
+    "Item Type": {
+        "on_update": "c4pricing.api.code_meta_cache.invalidate",
+        "on_trash": "c4pricing.api.code_meta_cache.invalidate",
+        "after_rename": "c4pricing.api.code_meta_cache.invalidate",
+    },
+    # keep the "Latest Item Rate" snapshot current
+    "Item Price": {
+        "on_update": "c4pricing.api.rate_snapshot.on_item_price_change",
+        "after_delete": "c4pricing.api.rate_snapshot.on_item_price_change",
+    },
+    "Purchase Invoice": {
+        "on_submit": "c4pricing.api.rate_snapshot.on_purchase_change",
+        "on_cancel": "c4pricing.api.rate_snapshot.on_purchase_change",
+    },
+    "Purchase Receipt": {
+        "on_submit": "c4pricing.api.rate_snapshot.on_purchase_change",
+        "on_cancel": "c4pricing.api.rate_snapshot.on_purchase_change",
+    },
+    "Stock Ledger Entry": {
+        "on_submit": "c4pricing.api.rate_snapshot.on_stock_ledger_entry",
+    },
+    "Repost Item Valuation": {
+        "on_change": "c4pricing.api.rate_snapshot.on_repost_change",
     },
 }
 
@@ -1,18 +1,17 @@
 # c4pricing/overrides/item_naming.py
 from __future__ import annotations
-from c4pricing.api.item_code_rules import next_code
+from c4pricing.api.item_code_rules import PREVIEW_KEY, _code_plan, _consume
 
 def before_insert_set_code(doc, method=None):
-    """If UI didn't set item_code, generate it here; keep name == item_code."""
-    if getattr(doc, "item_code", None):
-        doc.name = doc.item_code
-        return
+    """
+    If UI didn't set item_code, generate it here; keep name == item_code.
 
+    The form only shows a preview (next_code(preview=1)) and sends it back in
+    PREVIEW_KEY; an item_code still equal to that preview is replaced by a
+    real, consumed code. Any other item_code is kept.
+    """
     item_type = getattr(doc, "custom_item_type", None) or getattr(doc, "item_type", None)
-    if not item_type:
-        return
-
-    code = next_code(
+    spec = dict(
         item_type=item_type,
         item_group=getattr(doc, "item_group", None),
         brand=getattr(doc, "brand", None),
@@ -20,6 +19,19 @@ def before_insert_set_code(doc, method=None):
         part_type=getattr(doc, "custom_part_type", None),
         item_name=getattr(doc, "item_name", None),
     )
+
+    if getattr(doc, "item_code", None):
+        is_preview = doc.get(PREVIEW_KEY) == doc.item_code
+        plan = _code_plan(**spec, strict=False) if item_type and is_preview else None
+        if not plan:
+            doc.name = doc.item_code
+            return
+    elif not item_type:
+        return
+    else:
+        plan = _code_plan(**spec)
+
+    code = _consume(plan)
     if code:
         doc.item_code = code
         doc.name = code
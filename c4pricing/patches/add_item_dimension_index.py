@@ -0,0 +1,21 @@
+import frappe
+
+from c4pricing.api.item_search import DIMENSION_COLUMNS, DIMENSION_INDEX
+
+
+def execute():
+    """Composite index behind the dimension range / nearest-size search."""
+    if not all(frappe.db.has_column("Item", c) for c in DIMENSION_COLUMNS):
+        return
+
+    existing = [
+        r.Column_name
+        for r in frappe.db.sql("show index from `tabItem` where Key_name = %s", DIMENSION_INDEX, as_dict=True)
+    ]
+    if existing == list(DIMENSION_COLUMNS):
+        return
+    if existing:
+        # an earlier column order: rebuild
+        frappe.db.sql_ddl(f"alter table `tabItem` drop index `{DIMENSION_INDEX}`")
+
+    frappe.db.add_index("Item", list(DIMENSION_COLUMNS), DIMENSION_INDEX)
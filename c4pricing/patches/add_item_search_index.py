@@ -0,0 +1,17 @@
+import frappe
+
+from c4pricing.api.item_search import FULLTEXT_COLUMNS, FULLTEXT_INDEX
+
+
+def execute():
+    """FULLTEXT index behind c4pricing.api.item_search.search_items."""
+    if frappe.db.db_type != "mariadb":
+        return
+
+    if frappe.db.sql("show index from `tabItem` where Key_name = %s", FULLTEXT_INDEX):
+        return
+
+    frappe.db.sql_ddl(
+        f"alter table `tabItem` add fulltext index `{FULLTEXT_INDEX}` ({', '.join(FULLTEXT_COLUMNS)})"
+    )
+    frappe.cache.delete_value("c4pricing:item_fulltext")
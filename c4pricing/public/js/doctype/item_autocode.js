@@ -4,7 +4,10 @@
     return frm.doc.custom_item_type || frm.doc.item_type || null;
   }
 
-  async function apply_item_group_filter(frm) {
+  // Server-side link query over the cached Item Group tree (no per-refresh call)
+  const ITEM_GROUP_QUERY = "c4pricing.api.item_group_filters.item_group_query";
+
+  function apply_item_group_filter(frm) {
     const t = (get_item_type(frm) || "").trim().toLowerCase();
 
     // Default: clear custom query
@@ -15,33 +18,19 @@
       if (frm.doc.item_group !== "Sub Assemblies") {
         frm.set_value("item_group", "Sub Assemblies");
       }
-      query_opts = { filters: { name: ["=", "Sub Assemblies"] } };
+      query_opts = { query: ITEM_GROUP_QUERY, filters: { name: "Sub Assemblies" } };
 
     } else if (t === "standard product" || t === "customized product") {
-      // Only under "Products" (immediate children are fine here)
-      query_opts = { filters: { parent_item_group: ["=", "Products"] } };
+      // Everything under "Products" (children + sub-children)
+      query_opts = { query: ITEM_GROUP_QUERY, filters: { ancestor: "Products" } };
 
     } else if (t === "accessories") {
-      // Only under "Accessorise"
-      query_opts = { filters: { parent_item_group: ["=", "Accessorise"] } };
+      // Everything under "Accessorise"
+      query_opts = { query: ITEM_GROUP_QUERY, filters: { ancestor: "Accessorise" } };
 
     } else if (t === "material item") {
-      // All descendants of "Materials": use lft/rgt bounds from server
-      try {
-        const r = await frappe.call({
-          method: "c4pricing.api.bounds",
-          args: { parent_group: "Materials" },
-        });
-        if (r && r.message) {
-          const { lft, rgt } = r.message;
-          // Only leaf groups (is_group = 0) within the subtree
-          query_opts = { filters: { lft: [">=", lft], rgt: ["<=", rgt], is_group: 0 } };
-        }
-      } catch (e) {
-        console.error("Materials bounds error:", e);
-        // Fallback (at least limit to direct children)
-        query_opts = { filters: { parent_item_group: ["=", "Materials"] } };
-      }
+      // Only leaf groups (is_group = 0) anywhere under "Materials"
+      query_opts = { query: ITEM_GROUP_QUERY, filters: { ancestor: "Materials", leaves_only: 1 } };
     }
 
     frm.set_query("item_group", () => query_opts);
@@ -84,9 +73,13 @@
           main_product: frm.doc.custom_main_product || null,
           part_type: frm.doc.custom_part_type || null,
           item_name: frm.doc.item_name || null,
+          // preview only: the series number is consumed on insert
+          preview: 1,
         },
       });
       if (r && r.message) {
+        // tells before_insert_set_code to replace the preview with a real code
+        frm.doc.__c4pricing_code_preview = r.message;
         frm.set_value("item_code", r.message);
       }
     } catch (e) {
@@ -4,14 +4,58 @@
   const STANDARD_CHILD_DT = "Opportunity Standard (C4)"; // <-- change to your child DocType name
 
   // ------------- pricing helpers -------------
-  async function get_last_selling_rate(item_code, price_list) {
-    const rows = await frappe.db.get_list("Item Price", {
-      fields: ["price_list_rate"],
-      filters: { item_code, selling: 1, ...(price_list ? { price_list } : {}) },
-      order_by: "modified desc",
-      limit: 1,
+  // item tables on Opportunity -> the field holding the item code
+  const PRICED_TABLES = { items: "item_code", custom_standard: "item" };
+
+  function price_list_of(frm) {
+    const v = frm.doc || {};
+    return v.selling_price_list || v.price_list || null;
+  }
+
+  // latest selling rate of many items in ONE request -> { item_code: rate }
+  async function get_selling_rates(item_codes, price_list) {
+    const codes = [...new Set((item_codes || []).filter(Boolean))];
+    if (!codes.length) return {};
+    const r = await frappe.call({
+      method: "c4pricing.api.selling_rates.get_selling_rates",
+      args: { item_codes: codes, price_list },
     });
-    return (rows && rows.length && flt(rows[0].price_list_rate)) || 0;
+    return r.message || {};
+  }
+
+  // a row that never got a rate, as opposed to one priced at 0 on purpose
+  function is_unpriced(row) {
+    return !!row.__unpriced || row.rate === null || row.rate === undefined || row.rate === "";
+  }
+
+  // reprice rows of both item tables from one batched lookup; explicit zero
+  // rates are left alone. Marks the form dirty when a rate changed.
+  async function reprice_rows(frm) {
+    const targets = [];
+    Object.entries(PRICED_TABLES).forEach(([table, item_field]) => {
+      (frm.doc[table] || []).forEach((row) => {
+        if (!row[item_field]) return;
+        if (!flt(row.rate) && !is_unpriced(row)) return;
+        targets.push([table, item_field, row]);
+      });
+    });
+    if (!targets.length) return 0;
+
+    const rates = await get_selling_rates(targets.map(([, f, row]) => row[f]), price_list_of(frm));
+    let changed = 0;
+    const tables = new Set();
+    targets.forEach(([table, item_field, row]) => {
+      const rate = flt(rates[row[item_field]]);
+      delete row.__unpriced;
+      if (rate === flt(row.rate)) return;
+      row.rate = rate;
+      recalc_row(row);
+      tables.add(table);
+      changed += 1;
+    });
+    tables.forEach((t) => frm.refresh_field(t));
+    if (changed) frm.dirty();
+    return changed;
   }
 
   function recalc_row(row) {
@@ -22,53 +66,86 @@
     row.base_amount = row.amount;
   }
 
-  function insert_to_custom_standard(frm, it) {
-    frm.add_child("custom_standard", {
-      item: it.name,
-      item_name: it.item_name,
-      description: it.description,
-      uom: it.stock_uom,
-      qty: 1,
-      rate: 0,
-      amount: 0,
-    });
-    frm.refresh_field("custom_standard");
-  }
-
-  function insert_to_items(frm, it) {
-    frm.add_child("items", {
-      item_code: it.name,
-      item_name: it.item_name,
-      description: it.description,
-      uom: it.stock_uom,
-      qty: 1,
-      rate: 0,
-      amount: 0,
-      base_rate: 0,
-      base_amount: 0,
+  // append priced payloads from get_selector_rows; ONE grid refresh for the batch
+  function append_rows(frm, table, payloads) {
+    (payloads || []).forEach((p) => {
+      if (table === "custom_standard") {
+        frm.add_child("custom_standard", {
+          item: p.item_code,
+          item_name: p.item_name,
+          description: p.description,
+          uom: p.uom,
+          qty: p.qty,
+          rate: p.rate,
+          amount: p.amount,
+        });
+      } else {
+        frm.add_child("items", {
+          item_code: p.item_code,
+          item_name: p.item_name,
+          description: p.description,
+          uom: p.uom,
+          qty: p.qty,
+          rate: p.rate,
+          amount: p.amount,
+          base_rate: p.rate,
+          base_amount: p.amount,
+        });
+      }
     });
-    frm.refresh_field("items");
+    frm.refresh_field(table);
   }
 
   async function handle_new_row_price(frm, grid_fieldname, rowname, item_fieldname) {
-    const v = frm.doc || {};
     const row = frappe.get_doc(frm.fields_dict[grid_fieldname].grid.doctype, rowname);
     const code = row[item_fieldname];
     if (!code) return;
 
-    const pl = (v.selling_price_list || v.price_list || null);
-    const rate = await get_last_selling_rate(code, pl);
-    row.rate = rate || 0;
+    const rates = await get_selling_rates([code], price_list_of(frm));
+    delete row.__unpriced;
+    row.rate = flt(rates[code]) || 0;
     recalc_row(row);
     frm.refresh_field(grid_fieldname);
+    frm.dirty();
   }
 
   // ------------- selector helpers -------------
   const esc = frappe.utils.escape_html;
 
+  // same mapping as c4pricing.api.thumbnails.thumbnail_url
+  function thumb_url(src) {
+    if (!src || !src.startsWith("/files/")) return null;
+    let rel;
+    try { rel = decodeURIComponent(src.split("?")[0].slice("/files/".length)); } catch (e) { return null; }
+    if (!rel || rel.startsWith("c4pricing_thumbs/") || rel.split("/").includes("..")) return null;
+    return `/files/c4pricing_thumbs/${encodeURIComponent(rel.split("/").join("__"))}.webp`;
+  }
+
+  // thumbnail only; the full-size original loads on explicit click
   function img(src) {
     if (!src) return "";
-    return `<div class="p-2"><img style="max-width:100%;max-height:280px;border-radius:8px" src="${frappe.urllib.get_full_url(src)}"/></div>`;
+    const original = frappe.urllib.get_full_url(src);
+    const thumb = thumb_url(src);
+    if (!thumb) {
+      return `<div class="p-2"><a href="${esc(original)}" target="_blank" rel="noopener">${__("View image")}</a></div>`;
+    }
+    // not generated yet: the endpoint creates it and redirects
+    const lazy = `/api/method/c4pricing.api.thumbnails.get_thumbnail?image=${encodeURIComponent(src)}`;
+    return `<div class="p-2"><a href="${esc(original)}" target="_blank" rel="noopener" title="${__("Open original")}">
+      <img style="max-width:100%;max-height:280px;border-radius:8px" loading="lazy"
+        src="${esc(thumb)}" data-fallback="${esc(lazy)}"/></a></div>`;
+  }
+
+  // error events don't bubble: listen in the capture phase, swap to the
+  // lazy-thumbnail URL once
+  function bind_image_fallback($wrapper) {
+    $wrapper[0].addEventListener("error", (e) => {
+      const el = e.target;
+      if (el.tagName !== "IMG" || !el.dataset.fallback) return;
+      const fallback = el.dataset.fallback;
+      delete el.dataset.fallback;
+      el.src = fallback;
+    }, true);
   }
 
   function strip_html(html) {
@@ -81,52 +158,188 @@
     }
   }
 
-  // Row for results table (with Add button)
-  function resultRow(it) {
+  // Row for results table (checkbox + qty + Add button)
+  function resultRow(it, rate, picked) {
     return `
       <tr class="c4p-row" data-code="${esc(it.name)}" style="cursor:pointer">
+        <td style="width:32px"><input type="checkbox" class="c4p-pick" data-code="${esc(it.name)}" ${picked ? "checked" : ""}/></td>
         <td>${esc(it.name)}</td>
         <td>${esc(it.item_name || "")}</td>
         <td>${esc(it.custom_material_line || "")}</td>
         <td>${esc(it.item_group || "")}</td>
+        <td class="text-right">${rate ? format_currency(rate) : "-"}</td>
+        <td style="width:80px">
+          <input type="number" min="0" step="any" class="form-control input-xs c4p-qty" data-code="${esc(it.name)}" value="${picked ? picked : 1}"/>
+        </td>
         <td style="width:80px">
           <button class="btn btn-xs btn-primary c4p-add" data-code="${esc(it.name)}">${__("Add")}</button>
         </td>
       </tr>`;
   }
 
-  // ---- fetch items with DIMENSIONS filtering ----
-  async function fetchItems({ item_type, brand, item_group, material_line, txt, limit, w, h, d }) {
-    const filters = { disabled: 0 };
-    if (item_type)     filters["custom_item_type"]     = item_type;   // "Standard Product" | "Customized Product"
-    if (brand)         filters["brand"]                = brand;
-    if (item_group)    filters["item_group"]           = item_group;
-    if (material_line) filters["custom_material_line"] = material_line;
-
-    // exact match numeric filtering if values are provided
-    const wv = (w !== undefined && w !== null && String(w).trim() !== "") ? flt(w) : null;
-    const hv = (h !== undefined && h !== null && String(h).trim() !== "") ? flt(h) : null;
-    const dv = (d !== undefined && d !== null && String(d).trim() !== "") ? flt(d) : null;
+  // ---- fetch one page of items (server-side indexed search) ----
+  function dim(v) {
+    return (v !== undefined && v !== null && String(v).trim() !== "") ? flt(v) : null;
+  }
 
-    if (wv !== null) filters["custom_width"]  = ["=", wv];
-    if (hv !== null) filters["custom_hight"]  = ["=", hv];   // spelling per your schema
-    if (dv !== null) filters["custom_depth"]  = ["=", dv];
+  async function fetchItems({ item_type, brand, item_group, material_line, txt, limit, w, h, d, tolerance, nearest, after }) {
+    const r = await frappe.call({
+      method: "c4pricing.api.item_search.search_items",
+      args: {
+        txt: txt || null,
+        item_type, brand, item_group, material_line,
+        // sizes within +/- tolerance (exact when 0), or the nearest sizes
+        width: dim(w),
+        height: dim(h),
+        depth: dim(d),
+        tolerance: flt(tolerance),
+        nearest: cint(nearest),
+        after: after || null,
+        limit: cint(limit || 20),
+      },
+    });
+    return r.message || { items: [], next: null };
+  }
 
-    return await frappe.db.get_list("Item", {
-      fields: [
-        "name","item_name","description","stock_uom","image",
-        "item_group","custom_material_line",
-        "custom_width","custom_hight","custom_depth"
-      ],
-      filters,
-      or_filters: txt ? [
-        ["Item","name","like",`%${txt}%`],
-        ["Item","item_name","like",`%${txt}%`],
-        ["Item","description","like",`%${txt}%`],
-      ] : [],
-      order_by: "item_name asc",
-      limit: cint(limit || 20),
+  // ------------- local catalogue (IndexedDB + delta sync) -------------
+  // The selector filters a browser-side copy of the catalogue; the server is
+  // only asked for items modified since the stored watermark.
+  const catalogue = (() => {
+    const DB_NAME = `c4pricing_catalogue:${frappe.boot.sitename || location.host}:${frappe.session.user}`;
+    let db_promise = null;
+    let rows = null;      // in-memory copy, sellable items only
+    let syncing = null;
+
+    const req = (r) => new Promise((resolve, reject) => {
+      r.onsuccess = () => resolve(r.result);
+      r.onerror = () => reject(r.error);
     });
+
+    function open() {
+      if (!window.indexedDB) return Promise.reject(new Error("IndexedDB not available"));
+      if (!db_promise) {
+        const r = indexedDB.open(DB_NAME, 1);
+        r.onupgradeneeded = () => {
+          r.result.createObjectStore("items", { keyPath: "name" });
+          r.result.createObjectStore("meta");
+        };
+        db_promise = req(r);
+      }
+      return db_promise;
+    }
+
+    async function load(db) {
+      const all = await req(db.transaction("items").objectStore("items").getAll());
+      rows = all.filter((it) => !cint(it.disabled));
+    }
+
+    async function apply_delta(db, page) {
+      const t = db.transaction(["items", "meta"], "readwrite");
+      const store = t.objectStore("items");
+      (page.deleted || []).forEach((name) => store.delete(name));
+      (page.items || []).forEach((it) => store.put(it));
+      const meta = t.objectStore("meta");
+      meta.put(page.watermark, "watermark");
+      if (page.deleted_since !== undefined) meta.put(page.deleted_since, "deleted_since");
+      await new Promise((resolve, reject) => { t.oncomplete = resolve; t.onerror = () => reject(t.error); });
+      return (page.items || []).length + (page.deleted || []).length;
+    }
+
+    async function run_sync() {
+      const db = await open();
+      const meta = db.transaction("meta").objectStore("meta");
+      let wm = (await req(meta.get("watermark"))) || {};
+      const deleted_since = await req(meta.get("deleted_since"));
+
+      let changed = 0;
+      let first = true;
+      for (;;) {
+        const r = await frappe.call({
+          method: "c4pricing.api.item_search.catalogue_delta",
+          args: {
+            since: wm.since || null,
+            after: wm.after || null,
+            // deletions have their own watermark: ask for them once per sync
+            with_deleted: first ? 1 : 0,
+            deleted_since: first ? (deleted_since || null) : null,
+          },
+        });
+        const page = r.message || {};
+        changed += await apply_delta(db, page);
+        wm = page.watermark || wm;
+        first = false;
+        if (!page.more) break;
+      }
+      if (changed || !rows) await load(db);
+      return changed;
+    }
+
+    return {
+      // resolves to the number of changed items; concurrent callers share one sync
+      sync() {
+        if (!syncing) syncing = run_sync().finally(() => { syncing = null; });
+        return syncing;
+      },
+      // cached rows, or null when the cache is not (yet) usable
+      async rows() {
+        if (rows) return rows;
+        try { await load(await open()); } catch (e) { return null; }
+        return rows && rows.length ? rows : null;
+      },
+    };
+  })();
+
+  // words as c4pricing.api.item_search tokenizes them (\w+)
+  const words = (s) => s.match(/[\p{L}\p{N}_]+/gu) || [];
+
+  // c4pricing.api.item_search.search_items over the cached fields: filters,
+  // sizes and ordering are the same. Text matches the whole text as a code /
+  // name prefix, or every word as a word prefix of the code or name; the
+  // description is not cached and FULLTEXT relevance is not reproduced, so
+  // the caller asks the server when a text search finds nothing here.
+  function localSearch(all, { item_type, brand, item_group, material_line, txt, limit, w, h, d, tolerance, nearest, after }) {
+    const dims = [["custom_width", dim(w)], ["custom_hight", dim(h)], ["custom_depth", dim(d)]]
+      .filter(([, v]) => v !== null);
+    const tol = Math.abs(flt(tolerance));
+    const q = (txt || "").trim().toLowerCase();
+    const tokens = words(q);
+
+    const out = [];
+    for (const it of all) {
+      if (item_type && it.custom_item_type !== item_type) continue;
+      if (brand && it.brand !== brand) continue;
+      if (item_group && it.item_group !== item_group) continue;
+      if (material_line && it.custom_material_line !== material_line) continue;
+
+      const code = (it.name || "").toLowerCase();
+      const iname = (it.item_name || "").toLowerCase();
+      let score = 0;
+      if (q) {
+        if (!code.startsWith(q) && !iname.startsWith(q)) {
+          const hay = words(`${code} ${iname}`);
+          if (!tokens.length || !tokens.every((t) => hay.some((wd) => wd.startsWith(t)))) continue;
+        }
+        score = (code === q) * 100 + code.startsWith(q) * 50 + iname.startsWith(q) * 20;
+      }
+      if (dims.length) {
+        // like the server: no value for a requested dimension, no match
+        if (dims.some(([f]) => it[f] === null || it[f] === undefined)) continue;
+        if (!cint(nearest) && dims.some(([f, v]) => Math.abs(flt(it[f]) - v) > tol)) continue;
+        score = -Math.sqrt(dims.reduce((acc, [f, v]) => acc + (flt(it[f]) - v) ** 2, 0));
+      }
+      out.push({ it, score });
+    }
+
+    out.sort((a, b) => (b.score - a.score)
+      || (a.it.item_name || "").localeCompare(b.it.item_name || "")
+      || (a.it.name < b.it.name ? -1 : a.it.name > b.it.name ? 1 : 0));
+
+    const start = cint(after);
+    const size = cint(limit || 20);
+    return {
+      items: out.slice(start, start + size).map((x) => x.it),
+      next: start + size < out.length ? start + size : null,
+    };
   }
 
   function openItemSelector(frm) {
@@ -157,6 +370,8 @@
         { label: __("Width (W)"),  fieldname: "custom_width",  fieldtype: "Float" },
         { label: __("Height (H)"), fieldname: "custom_height", fieldtype: "Float" },
         { label: __("Depth (D)"),  fieldname: "custom_depth",  fieldtype: "Float" },
+        { label: __("Size tolerance (±)"), fieldname: "size_tolerance", fieldtype: "Float", default: 0 },
+        { label: __("Nearest sizes"), fieldname: "nearest_sizes", fieldtype: "Check", default: 0 },
 
         // Apply
         { fieldtype: "Section Break" },
@@ -179,24 +394,34 @@
 
     const $res = d.get_field("results_html").$wrapper;
     const $prev = d.get_field("preview_html").$wrapper;
+    bind_image_fallback($prev);
 
-    // Results table with 5 columns
+    // Results table with 8 columns
     $res.html(`
       <div style="max-height:520px;overflow:auto;border:1px solid var(--border-color);border-radius:8px">
         <table class="table table-bordered table-hover" style="margin:0">
           <thead>
             <tr>
+              <th style="width:32px"></th>
               <th>${__("Item Code")}</th>
               <th>${__("Item Name")}</th>
               <th>${__("Material Line")}</th>
               <th>${__("Item Group")}</th>
+              <th class="text-right">${__("Price")}</th>
+              <th style="width:80px">${__("Qty")}</th>
               <th style="width:80px">${__("Add")}</th>
             </tr>
           </thead>
           <tbody class="c4p-body"></tbody>
         </table>
       </div>
-      <div class="text-muted mt-2">${__("Click Add to insert the item")}</div>
+      <div class="mt-2 text-center">
+        <button class="btn btn-xs btn-default c4p-more" style="display:none">${__("Load more")}</button>
+      </div>
+      <div class="mt-2 d-flex justify-content-between align-items-center">
+        <span class="text-muted">${__("Tick items and set quantities, or click Add to insert one item")}</span>
+        <button class="btn btn-sm btn-primary c4p-add-selected" disabled>${__("Add Selected")} (<span class="c4p-count">0</span>)</button>
+      </div>
     `);
 
     // Preview card
@@ -211,9 +436,29 @@
     const $preview = $prev.find(".c4p-preview");
     const $muted = $prev.find(".c4p-preview-muted");
 
-    const refreshList = async () => {
+    const $more = $res.find(".c4p-more");
+    const $addSelected = $res.find(".c4p-add-selected");
+    let items = [];
+    let next = null;
+    let seq = 0;
+    let local = null;   // cached rows the current result list was built from
+    // item_code -> { qty, table }, kept across searches and pages; the target
+    // table is fixed by the item type selected when the item was picked
+    const picked = new Map();
+    const targetTable = () => (d.get_value("custom_item_type") === "Standard Product" ? "custom_standard" : "items");
+
+    const updatePicked = () => {
+      $res.find(".c4p-count").text(picked.size);
+      $addSelected.prop("disabled", !picked.size);
+    };
+
+    const loadPage = async (append) => {
       const v = d.get_values();
-      const items = await fetchItems({
+      const my = ++seq;
+      // local catalogue when available, indexed server search otherwise;
+      // "Load more" keeps using the source of the first page
+      if (!append) local = await catalogue.rows();
+      const args = {
         item_type: v.custom_item_type,
         brand: v.brand,
         item_group: v.item_group,
@@ -223,79 +468,159 @@
         w: v.custom_width,
         h: v.custom_height,
         d: v.custom_depth,
-      });
+        tolerance: v.size_tolerance,
+        nearest: v.nearest_sizes,
+        after: append ? next : null,
+      };
+      let page = await (local ? localSearch.bind(null, local) : fetchItems)(args);
+      if (local && !append && (v.q || "").trim() && !(page.items || []).length) {
+        // descriptions are only searchable on the server
+        local = null;
+        page = await fetchItems(args);
+      }
+      if (my !== seq) return; // a newer search superseded this one
+      const rates = await get_selling_rates((page.items || []).map((it) => it.name), price_list_of(frm));
+      if (my !== seq) return;
+
+      if (!append) { items = []; $body.empty(); }
+      items = items.concat(page.items || []);
+      next = page.next;
+      $more.toggle(!!next);
 
-      $body.empty();
       if (!items.length) {
-        $body.append(`<tr><td colspan="5" class="text-muted text-center">${__("No items found")}</td></tr>`);
+        $body.append(`<tr><td colspan="8" class="text-muted text-center">${__("No items found")}</td></tr>`);
         $muted.show(); $preview.html("");
         return;
       }
+      (page.items || []).forEach((it) => $body.append(resultRow(it, rates[it.name], picked.get(it.name)?.qty)));
+    };
 
-      items.forEach((it) => $body.append(resultRow(it)));
-
-      // Hover shows preview
-      $body.find(".c4p-row").on("mouseenter", function () {
-        const code = this.dataset.code;
-        const it = items.find((x) => x.name === code);
-        if (!it) return;
-        const dims = [it.custom_width, it.custom_hight, it.custom_depth]
-          .map(v => (v==null || v==="") ? "-" : String(v)).join(" × ");
-
-        $muted.hide();
-        $preview.html(`
-          <div class="p-2">
-            <div class="mb-1" style="font-weight:600">${esc(it.item_name || it.name)}</div>
-            <div class="text-muted mb-1">${esc(it.name)}</div>
-            ${img(it.image)}
-            <div class="mb-2" style="white-space:pre-wrap">${esc(strip_html(it.description) || "")}</div>
-            <div class="grid" style="grid-template-columns: repeat(2, minmax(0,1fr)); gap:8px">
-              <div><span class="text-muted">${__("Material Line")}:</span> ${esc(it.custom_material_line || "-")}</div>
-              <div><span class="text-muted">${__("Item Group")}:</span> ${esc(it.item_group || "-")}</div>
-            </div>
-            <div class="mt-2"><span class="text-muted">${__("Dimensions")}:</span> ${esc(dims)}</div>
-            <div class="text-muted">${__("UOM")}: ${esc(it.stock_uom || "-")}</div>
-          </div>
-        `);
-      });
+    const refreshList = () => loadPage(false);
+    const refreshSoon = frappe.utils.debounce(refreshList, 300);
 
-      // Add button + click on row
-      async function addItemByCode(code) {
-        const it = items.find((x) => x.name === code);
-        if (!it) return;
-        const isStd = (d.get_value("custom_item_type") === "Standard Product");
-        if (isStd) insert_to_custom_standard(frm, it);
-        else insert_to_items(frm, it);
-
-        const grid_field = isStd ? "custom_standard" : "items";
-        const last_row = frm.doc[grid_field][frm.doc[grid_field].length - 1];
-        await handle_new_row_price(
-          frm, grid_field, last_row.name, isStd ? "item" : "item_code"
-        );
-        frappe.show_alert({ message: __("Item added: ") + it.name, indicator: "green" });
+    // descriptions are not cached locally; fetch once per item for the preview
+    const descriptions = {};
+    async function describe(it) {
+      if (it.description !== undefined) return it.description;
+      if (!(it.name in descriptions)) {
+        descriptions[it.name] = frappe.db.get_value("Item", it.name, "description")
+          .then((r) => (r.message && r.message.description) || "");
       }
+      return descriptions[it.name];
+    }
 
-      $body.find(".c4p-add").on("click", async function (e) {
-        e.preventDefault(); e.stopPropagation();
-        await addItemByCode(this.dataset.code);
+    // Hover shows preview
+    $body.on("mouseenter", ".c4p-row", async function () {
+      const code = this.dataset.code;
+      const it = items.find((x) => x.name === code);
+      if (!it) return;
+      const description = await describe(it);
+      if (!$body.find(".c4p-row:hover").is(this)) return;
+      const dims = [it.custom_width, it.custom_hight, it.custom_depth]
+        .map(v => (v==null || v==="") ? "-" : String(v)).join(" × ");
+
+      $muted.hide();
+      $preview.html(`
+        <div class="p-2">
+          <div class="mb-1" style="font-weight:600">${esc(it.item_name || it.name)}</div>
+          <div class="text-muted mb-1">${esc(it.name)}</div>
+          ${img(it.image)}
+          <div class="mb-2" style="white-space:pre-wrap">${esc(strip_html(description) || "")}</div>
+          <div class="grid" style="grid-template-columns: repeat(2, minmax(0,1fr)); gap:8px">
+            <div><span class="text-muted">${__("Material Line")}:</span> ${esc(it.custom_material_line || "-")}</div>
+            <div><span class="text-muted">${__("Item Group")}:</span> ${esc(it.item_group || "-")}</div>
+          </div>
+          <div class="mt-2"><span class="text-muted">${__("Dimensions")}:</span> ${esc(dims)}</div>
+          <div class="text-muted">${__("UOM")}: ${esc(it.stock_uom || "-")}</div>
+        </div>
+      `);
+    });
+
+    // one server call prices every chosen item; rows are appended with one refresh
+    async function addItems(entries, table) {
+      if (!entries.length) return;
+      const r = await frappe.call({
+        method: "c4pricing.api.selling_rates.get_selector_rows",
+        args: {
+          items: entries.map(([item_code, qty]) => ({ item_code, qty })),
+          price_list: price_list_of(frm),
+        },
+        freeze: entries.length > 20,
       });
-      $body.find(".c4p-row").on("click", async function () {
-        await addItemByCode(this.dataset.code);
+      const rows = r.message || [];
+      append_rows(frm, table, rows);
+      frappe.show_alert({
+        message: rows.length === 1 ? __("Item added: ") + rows[0].item_code : __("{0} items added", [rows.length]),
+        indicator: "green",
       });
-    };
+      return rows;
+    }
 
-    // Auto refresh on filters + Apply button
-    ["custom_item_type","brand","item_group","custom_material_line","q","limit","custom_width","custom_height","custom_depth"]
-      .forEach(fn => { const f = d.fields_dict[fn]; if (f?.$input) f.$input.on("change", refreshList); });
+    const qtyOf = (code) => flt($body.find(`.c4p-qty[data-code="${CSS.escape(code)}"]`).val()) || 1;
+
+    $body.on("click", ".c4p-add", async function (e) {
+      e.preventDefault(); e.stopPropagation();
+      await addItems([[this.dataset.code, qtyOf(this.dataset.code)]], targetTable());
+    });
+    $body.on("click", ".c4p-qty", (e) => e.stopPropagation());
+    $body.on("change", ".c4p-qty", function () {
+      const pick = picked.get(this.dataset.code);
+      if (pick) pick.qty = flt(this.value) || 1;
+    });
+    $body.on("change", ".c4p-pick", function () {
+      if (this.checked) picked.set(this.dataset.code, { qty: qtyOf(this.dataset.code), table: targetTable() });
+      else picked.delete(this.dataset.code);
+      updatePicked();
+    });
+    $body.on("click", ".c4p-pick", (e) => e.stopPropagation());
+    // click on row toggles its checkbox
+    $body.on("click", ".c4p-row", function () {
+      $(this).find(".c4p-pick").prop("checked", (_, v) => !v).trigger("change");
+    });
+    $addSelected.on("click", async () => {
+      // each pick goes to the table of the item type it was picked under
+      const by_table = {};
+      picked.forEach(({ qty, table }, code) => (by_table[table] = by_table[table] || []).push([code, qty]));
+      for (const [table, entries] of Object.entries(by_table)) {
+        if (!(await addItems(entries, table))) break;
+        entries.forEach(([code]) => {
+          picked.delete(code);
+          $body.find(`.c4p-pick[data-code="${CSS.escape(code)}"]`).prop("checked", false);
+        });
+      }
+      updatePicked();
+    });
+    $more.on("click", () => loadPage(true));
+
+    // Auto refresh on filters (debounced) + Apply button
+    ["custom_item_type","brand","item_group","custom_material_line","q","limit","custom_width","custom_height","custom_depth","size_tolerance","nearest_sizes"]
+      .forEach(fn => { const f = d.fields_dict[fn]; if (f?.$input) f.$input.on("change", refreshSoon); });
+    d.fields_dict.q.$input.on("input", refreshSoon);
 
     d.get_field("apply").$input.on("click", refreshList);
 
     d.show();
     refreshList();
+
+    // pull the delta in the background; re-render if anything changed
+    catalogue.sync()
+      .then((changed) => { if (changed || !local) refreshList(); })
+      .catch((e) => console.warn("c4pricing: catalogue sync failed, using server search", e));
   }
 
   // ------------- doctype wiring -------------
+  async function reprice_on_price_list_change(frm) {
+    if (frm.doc.docstatus !== 0) return;
+    const changed = await reprice_rows(frm);
+    if (changed) {
+      frappe.show_alert({ message: __("Repriced {0} row(s)", [changed]), indicator: "blue" });
+    }
+  }
+
   frappe.ui.form.on("Opportunity", {
+    selling_price_list: reprice_on_price_list_change,
+    price_list: reprice_on_price_list_change,
+
     refresh(frm) {
       // Create Costing Note (as you configured)
       if (!frm.is_new()) {
@@ -318,13 +643,14 @@
     items_add(frm, cdt, cdn) {
       const r = locals[cdt][cdn];
       r.rate = 0; r.amount = 0; r.base_rate = 0; r.base_amount = 0;
+      r.__unpriced = 1;  // until item_code prices it or the user types a rate
       frm.refresh_field("items");
     },
     item_code: async function (frm, cdt, cdn) {
       const r = locals[cdt][cdn];
       await handle_new_row_price(frm, "items", r.name, "item_code");
     },
-    rate: function (frm, cdt, cdn) { recalc_row(locals[cdt][cdn]); frm.refresh_field("items"); },
+    rate: function (frm, cdt, cdn) { delete locals[cdt][cdn].__unpriced; recalc_row(locals[cdt][cdn]); frm.refresh_field("items"); },
     qty: function (frm, cdt, cdn)  { recalc_row(locals[cdt][cdn]); frm.refresh_field("items"); },
   });
 
@@ -334,7 +660,7 @@
       const r = locals[cdt][cdn];
       await handle_new_row_price(frm, "custom_standard", r.name, "item");
     },
-    rate: function (frm, cdt, cdn) { recalc_row(locals[cdt][cdn]); frm.refresh_field("custom_standard"); },
+    rate: function (frm, cdt, cdn) { delete locals[cdt][cdn].__unpriced; recalc_row(locals[cdt][cdn]); frm.refresh_field("custom_standard"); },
     qty: function (frm, cdt, cdn)  { recalc_row(locals[cdt][cdn]); frm.refresh_field("custom_standard"); },
   });
 })();
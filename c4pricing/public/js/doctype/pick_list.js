@@ -4,22 +4,30 @@ frappe.ui.form.on('Pick List', {
     // لا نضيف أي زر مخصص – نستخدم الزر القياسي الموجود في النظام فقط
 
     // تعبئة مخزن المصدر من Item Group Defaults إن كان فارغًا
-    const company = frm.doc.company;
-    (frm.doc.locations || []).forEach(row => {
-      if (!row.warehouse && row.item_code) {
-        fetch_default_wh(row, company);
-      }
-    });
+    if (frm.doc.docstatus === 0) fill_default_whs(frm);
   }
 });
 
-function fetch_default_wh(row, company) {
+// one request for all rows without a warehouse, applied with one grid refresh
+function fill_default_whs(frm) {
+  const rows = (frm.doc.locations || [])
+    .filter(row => !row.warehouse && row.item_code)
+    .map(row => ({ name: row.name, item_code: row.item_code }));
+  if (!rows.length) return;
+
   frappe.call({
-    method: 'c4pricing.api.stock_entry.get_item_group_default_wh',
-    args: { item_code: row.item_code, company },
-    callback: (r) => {
-      const wh = r.message;
-      if (wh) frappe.model.set_value(row.doctype, row.name, 'warehouse', wh);
+    method: 'c4pricing.api.stock_entry.get_item_group_default_whs',
+    args: { rows, company: frm.doc.company },
+    callback: async (r) => {
+      const whs = r.message || {};
+      // skip rows the user filled in while the request was running;
+      // set_value runs the warehouse triggers and marks the form dirty
+      const updates = (frm.doc.locations || [])
+        .filter(row => whs[row.name] && !row.warehouse)
+        .map(row => frappe.model.set_value(row.doctype, row.name, 'warehouse', whs[row.name]));
+      if (!updates.length) return;
+      await Promise.all(updates);
+      frm.refresh_field('locations');
     }
   });
 }
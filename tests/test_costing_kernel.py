@@ -0,0 +1,123 @@
+# tests/test_costing_kernel.py
+"""
+Parity of the costing kernel with the per-row loops it replaced.
+
+Runs without Frappe: the kernel module is loaded from its file so the
+c4pricing.api package (which imports Frappe) is not needed.
+
+    python -m pytest tests/test_costing_kernel.py
+"""
+from __future__ import annotations
+
+import importlib.util
+import os
+import random
+import unittest
+
+_KERNEL = os.path.join(os.path.dirname(__file__), "..", "c4pricing", "api", "costing_kernel.py")
+_spec = importlib.util.spec_from_file_location("c4pricing_costing_kernel", _KERNEL)
+kernel = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(kernel)
+flt = kernel.flt
+
+
+def old_recalc_mat_or_lab(rows, percent_field="margin"):
+    """BOQ._recalc_mat_or_lab before the kernel (rows are dicts here)."""
+    if not rows:
+        return 0.0
+
+    table_sum = 0.0
+    for d in rows:
+        dc = flt(d.get("direct_cost"))
+        margin_pct = flt(d.get(percent_field))
+        qty = flt(d.get("qty") or 0)
+
+        cost = dc + (dc * margin_pct / 100.0)
+        d["cost"] = cost
+        d["total_cost"] = cost * qty
+        table_sum += d["total_cost"]
+
+    return table_sum
+
+
+def old_recalc_simple(rows):
+    """BOQ._recalc_simple before the kernel (rows are dicts here)."""
+    if not rows:
+        return 0.0
+
+    table_sum = 0.0
+    for d in rows:
+        cost = flt(d.get("cost"))
+        qty = flt(d.get("qty") or 0)
+        d["total_cost"] = cost * qty
+        table_sum += d["total_cost"]
+
+    return table_sum
+
+
+def random_rows(n, seed):
+    rnd = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        rows.append(
+            {
+                "direct_cost": round(rnd.uniform(0, 5000), rnd.choice((0, 2, 3, 6))),
+                "margin": rnd.choice((0, 7.5, 10, 12.345, 33.3333, None, "15")),
+                "qty": rnd.choice((0, 1, 2.5, 3, 1e-3, 125, None, "4")),
+                "cost": round(rnd.uniform(0, 900), 2),
+            }
+        )
+    return rows
+
+
+def copies(rows):
+    return [dict(r) for r in rows], [dict(r) for r in rows], [dict(r) for r in rows]
+
+
+class TestCostingKernel(unittest.TestCase):
+    def test_margin_rows_match_old_loop(self):
+        for n in (0, 1, 2, 17, 1000):
+            with self.subTest(rows=n):
+                old, pure, vec = copies(random_rows(n, seed=n))
+
+                expected = old_recalc_mat_or_lab(old)
+                self.assertEqual(kernel.recalc_margin_rows(pure, use_numpy=False), expected)
+                self.assertEqual(pure, old)
+
+                if kernel.np is not None:
+                    self.assertEqual(kernel.recalc_margin_rows(vec, use_numpy=True), expected)
+                    self.assertEqual(vec, old)
+
+    def test_simple_rows_match_old_loop(self):
+        for n in (0, 1, 5, 1000):
+            with self.subTest(rows=n):
+                old, pure, vec = copies(random_rows(n, seed=100 + n))
+
+                expected = old_recalc_simple(old)
+                self.assertEqual(kernel.recalc_simple_rows(pure, use_numpy=False), expected)
+                self.assertEqual(pure, old)
+
+                if kernel.np is not None:
+                    self.assertEqual(kernel.recalc_simple_rows(vec, use_numpy=True), expected)
+                    self.assertEqual(vec, old)
+
+    def test_percent_field(self):
+        rows = [{"direct_cost": 200, "markup": 25, "qty": 2}]
+        self.assertEqual(kernel.recalc_margin_rows(rows, percent_field="markup", use_numpy=False), 500.0)
+        self.assertEqual(rows[0]["cost"], 250.0)
+
+    def test_recalc_tables(self):
+        tables = {
+            "material_costs": [{"direct_cost": 100, "margin": 10, "qty": 2}],
+            "labor_costs": [{"direct_cost": 50, "margin": 20, "qty": 3}],
+            "expenses_table": [{"cost": 5, "qty": 4}],
+            "contractors_table": [{"cost": 7, "qty": 1}],
+        }
+        totals = kernel.recalc_tables(tables, use_numpy=False)
+        self.assertAlmostEqual(totals["total_material_costs"], 220)
+        self.assertAlmostEqual(totals["total_labor_costs"], 180)
+        self.assertAlmostEqual(totals["total_cost"], 427)
+
+
+if __name__ == "__main__":
+    unittest.main()